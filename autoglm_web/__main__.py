@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import importlib.util
 import os
 import sys
 
@@ -8,6 +9,15 @@ from .net import candidate_urls
 from .security import load_or_create_token, reset_token
 
 
+def _uvicorn_speedups() -> dict[str, str]:
+    """
+    uvloop / httptools 为可选依赖（Termux 上需要编译，可能装不上），有则使用，没有则回退到纯 Python 实现。
+    """
+    has_uvloop = importlib.util.find_spec("uvloop") is not None
+    has_httptools = importlib.util.find_spec("httptools") is not None
+    return {"loop": "uvloop" if has_uvloop else "asyncio", "http": "httptools" if has_httptools else "h11"}
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(prog="autoglm-web")
     sub = parser.add_subparsers(dest="cmd", required=True)
@@ -44,7 +54,11 @@ def main(argv: list[str] | None = None) -> int:
         except Exception as e:
             print(f"缺少依赖 uvicorn: {e}", file=sys.stderr)
             return 1
-        uvicorn.run("autoglm_web.app:app", host=host, port=port, log_level="info")
+        speedups = _uvicorn_speedups()
+        print(f"[autoglm-web] loop: {speedups['loop']}, http: {speedups['http']}")
+        # 访问日志默认关闭（每个请求一次 logger 调用，截图/日志流等高频请求下开销明显）
+        access_log = os.environ.get("AUTOGLM_WEB_ACCESS_LOG", "0") == "1"
+        uvicorn.run("autoglm_web.app:app", host=host, port=port, log_level="info", access_log=access_log, **speedups)
         return 0
 
     return 2
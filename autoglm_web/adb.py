@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import re
+import select
 import shlex
+import struct
 import subprocess
+import threading
+import uuid
+import zlib
 from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from time import sleep
+from time import monotonic, sleep
+from typing import Any
+
+from . import label_cache
 
 
 @dataclass(frozen=True)
@@ -19,8 +29,12 @@ class AdbDevice:
     transport_id: str | None = None
 
 
+# 运行环境在进程生命周期内不会变化，导入时判断一次即可
+_IN_TERMUX = bool(os.environ.get("TERMUX_VERSION"))
+
+
 def _in_termux() -> bool:
-    return bool(os.environ.get("TERMUX_VERSION"))
+    return _IN_TERMUX
 
 
 def _adb_not_found_message() -> str:
@@ -44,8 +58,9 @@ def _run_adb(args: list[str], timeout_s: int = 20, *, device_id: str | None = No
             text=True,
             timeout=timeout_s,
         )
-        out = (proc.stdout or "") + (proc.stderr or "")
-        return proc.returncode, out.strip()
+        # 绝大多数调用没有 stderr，避免为大段 stdout 再拼接一份副本
+        out = proc.stdout + proc.stderr if proc.stderr else proc.stdout
+        return _check_device_gone(proc.returncode, (out or "").strip())
     except FileNotFoundError:
         return 127, _adb_not_found_message()
     except subprocess.TimeoutExpired:
@@ -54,8 +69,167 @@ def _run_adb(args: list[str], timeout_s: int = 20, *, device_id: str | None = No
         return 1, f"adb 执行失败: {e}"
 
 
+class _AdbShellSession:
+    """
+    每个设备一个常驻的 `adb shell` 子进程：命令通过 stdin 写入，以随机结束标记界定输出，
+    避免每条 tap/swipe/keyevent 都重新拉起 adb 客户端并建立到 adbd 的连接。
+    """
+
+    def __init__(self, device_id: str | None) -> None:
+        self.device_id = device_id
+        self.lock = threading.Lock()
+        self._proc: subprocess.Popen | None = None
+
+    def _ensure(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                _adb_base_args(self.device_id) + ["shell"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+            )
+        return self._proc
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.kill()
+            proc.wait(timeout=2)
+        except Exception:
+            pass
+
+    def run(self, cmd: str, timeout_s: int) -> tuple[int, str]:
+        marker = f"__AUTOGLM_END_{uuid.uuid4().hex[:12]}__"
+        # 子 shell 执行，避免 cd/exit 等影响会话；stdin 重定向防止命令吞掉后续输入
+        script = f'( {cmd}\n) </dev/null 2>&1; echo "{marker}$?"\n'
+        with self.lock:
+            proc = self._ensure()
+            assert proc.stdin is not None and proc.stdout is not None
+            proc.stdin.write(script.encode("utf-8"))
+            proc.stdin.flush()
+            fd = proc.stdout.fileno()
+            deadline = monotonic() + timeout_s
+            buf = bytearray()
+            marker_b = marker.encode("ascii")
+            while True:
+                idx = buf.find(marker_b)
+                if idx >= 0:
+                    tail = buf[idx + len(marker_b) :]
+                    nl = tail.find(b"\n")
+                    if nl >= 0:
+                        try:
+                            rc = int(tail[:nl].strip() or b"1")
+                        except ValueError:
+                            rc = 1
+                        return rc, buf[:idx].decode("utf-8", errors="replace").strip()
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    self.close()
+                    return 124, f"adb 执行超时（>{timeout_s}s）：adb shell {cmd}"
+                ready, _, _ = select.select([fd], [], [], remaining)
+                if not ready:
+                    continue
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    self.close()
+                    out = buf.decode("utf-8", errors="replace").strip()
+                    return 1, out or "adb shell 会话意外结束"
+                buf += chunk
+
+
+_shell_sessions: dict[str | None, _AdbShellSession] = {}
+_shell_sessions_lock = threading.Lock()
+
+
+def _persistent_shell_enabled() -> bool:
+    return os.environ.get("AUTOGLM_ADB_PERSISTENT_SHELL", "1").strip() not in {"0", "false", "no"}
+
+
+def _close_shell_sessions() -> None:
+    with _shell_sessions_lock:
+        sessions = list(_shell_sessions.values())
+        _shell_sessions.clear()
+    for sess in sessions:
+        with sess.lock:
+            sess.close()
+
+
+def _run_shell(cmd: str, timeout_s: int = 20, *, device_id: str | None = None) -> tuple[int, str]:
+    """
+    优先通过常驻会话执行 `adb shell <cmd>`；会话不可用时回退为一次性 `adb shell`。
+    只用于内部拼接、语法确定的命令，用户输入的任意命令请走 shell()。
+    """
+    if _persistent_shell_enabled():
+        with _shell_sessions_lock:
+            sess = _shell_sessions.get(device_id)
+            if sess is None:
+                sess = _shell_sessions[device_id] = _AdbShellSession(device_id)
+        try:
+            return _check_device_gone(*sess.run(cmd, timeout_s))
+        except FileNotFoundError:
+            return 127, _adb_not_found_message()
+        except (OSError, ValueError):
+            # 管道已断开等：丢弃会话后回退
+            with sess.lock:
+                sess.close()
+    return _run_adb(["shell", cmd], timeout_s=timeout_s, device_id=device_id)
+
+
+# `adb devices -l` 每行：<serial> <status> [key:value ...]
+_DEVICE_LINE_RE = re.compile(r"^(\S+)\s+(\S+)(.*)$")
+_DEVICE_KV_RE = re.compile(r"([^\s:]+):(\S*)")
+
+
 def devices(*, raise_on_error: bool = False) -> list[AdbDevice]:
     code, out = _run_adb(["devices", "-l"], timeout_s=20)
+    return _remember_online(code, _parse_devices(code, out, raise_on_error=raise_on_error))
+
+
+_ONLINE_TTL_S = 2.0
+_online_cache: tuple[list[str], float] | None = None
+
+
+def _remember_online(code: int, ds: list[AdbDevice]) -> list[AdbDevice]:
+    global _online_cache
+    if code == 0:
+        _online_cache = ([d.serial for d in ds if d.status == "device"], monotonic())
+    return ds
+
+
+# adb 报告设备不存在/已离线：在线设备缓存已过时，下次选择默认设备时重新执行 adb devices
+_DEVICE_GONE_RE = re.compile(r"device (?:'[^']*' )?not found|device offline|no devices/emulators found")
+
+
+def _check_device_gone(code: int, out: str) -> tuple[int, str]:
+    global _online_cache
+    if code != 0 and _online_cache is not None and _DEVICE_GONE_RE.search(out):
+        _online_cache = None
+    return code, out
+
+
+def _cached_online() -> list[str] | None:
+    cached = _online_cache
+    if cached and monotonic() - cached[1] < _ONLINE_TTL_S:
+        return list(cached[0])
+    return None
+
+
+def online_serials() -> list[str]:
+    """
+    在线（status == device）设备的序列号，用于“未选择设备时自动选第一台”。
+    结果缓存 2 秒（任何一次 devices() 调用都会刷新），同一轮页面刷新内不再重复执行 adb devices；
+    connect/disconnect/restart_server 会清空缓存。
+    """
+    cached = _cached_online()
+    if cached is not None:
+        return cached
+    return [d.serial for d in devices(raise_on_error=False) if d.status == "device"]
+
+
+def _parse_devices(code: int, out: str, *, raise_on_error: bool) -> list[AdbDevice]:
     if code != 0:
         if raise_on_error:
             raise RuntimeError(out or "adb devices 执行失败")
@@ -65,19 +239,14 @@ def devices(*, raise_on_error: bool = False) -> list[AdbDevice]:
         return []
     result: list[AdbDevice] = []
     for line in lines[1:]:
-        parts = line.split()
-        if len(parts) < 2:
+        m = _DEVICE_LINE_RE.match(line)
+        if not m:
             continue
-        serial, status = parts[0], parts[1]
-        kv = {}
-        for p in parts[2:]:
-            if ":" in p:
-                k, v = p.split(":", 1)
-                kv[k] = v
+        kv = dict(_DEVICE_KV_RE.findall(m.group(3)))
         result.append(
             AdbDevice(
-                serial=serial,
-                status=status,
+                serial=m.group(1),
+                status=m.group(2),
                 product=kv.get("product"),
                 model=kv.get("model"),
                 device=kv.get("device"),
@@ -93,17 +262,22 @@ def pair(host_port: str, code: str) -> tuple[bool, str]:
 
 
 def connect(host_port: str) -> tuple[bool, str]:
+    _clear_device_caches()
     rc, out = _run_adb(["connect", host_port], timeout_s=30)
     return rc == 0, out
 
 
 def disconnect(host_port: str | None = None) -> tuple[bool, str]:
+    _close_shell_sessions()
+    _clear_device_caches()
     args = ["disconnect"] if not host_port else ["disconnect", host_port]
     rc, out = _run_adb(args, timeout_s=30)
     return rc == 0, out
 
 
 def restart_server() -> tuple[bool, str]:
+    _close_shell_sessions()
+    _clear_device_caches()
     rc1, out1 = _run_adb(["kill-server"], timeout_s=10)
     rc2, out2 = _run_adb(["start-server"], timeout_s=10)
     ok = rc1 == 0 and rc2 == 0
@@ -111,18 +285,78 @@ def restart_server() -> tuple[bool, str]:
     return ok, out
 
 
+_VERSION_TTL_S = 5.0
+_version_cache: tuple[tuple[bool, str], float] | None = None
+
+
+def _cached_version() -> tuple[bool, str] | None:
+    cached = _version_cache
+    if cached and monotonic() - cached[1] < _VERSION_TTL_S:
+        return cached[0]
+    return None
+
+
+def _remember_version(rc: int, out: str) -> tuple[bool, str]:
+    global _version_cache
+    res = (rc == 0, out)
+    _version_cache = (res, monotonic())
+    return res
+
+
 def version() -> tuple[bool, str]:
+    # /api/checks 每次刷新页面都会调用；短时间内复用结果，避免反复 fork adb
+    cached = _cached_version()
+    if cached is not None:
+        return cached
     rc, out = _run_adb(["version"], timeout_s=8)
-    return rc == 0, out
+    return _remember_version(rc, out)
 
 
-def list_packages(
-    third_party: bool = True, *, device_id: str | None = None, raise_on_error: bool = False
-) -> list[str]:
+def _list_packages_args(third_party: bool) -> list[str]:
     args = ["shell", "pm", "list", "packages"]
     if third_party:
         args.append("-3")
+    return args
+
+
+_PACKAGES_TTL_S = 5.0
+_packages_cache: dict[tuple[str | None, bool], tuple[list[str], float]] = {}
+
+
+def _cached_packages(device_id: str | None, third_party: bool) -> list[str] | None:
+    cached = _packages_cache.get((device_id, third_party))
+    if cached and monotonic() - cached[1] < _PACKAGES_TTL_S:
+        return list(cached[0])
+    return None
+
+
+def _parse_and_cache_packages(
+    code: int, out: str, *, device_id: str | None, third_party: bool, raise_on_error: bool
+) -> list[str]:
+    pkgs = _parse_package_list(code, out, raise_on_error=raise_on_error)
+    if code == 0:
+        _packages_cache[(device_id, third_party)] = (list(pkgs), monotonic())
+    return pkgs
+
+
+def list_packages(
+    third_party: bool = True, *, device_id: str | None = None, raise_on_error: bool = False
+) -> list[str]:
+    """
+    列出已安装包名。成功结果按 (设备, third_party) 缓存 5 秒，连续点击“获取包名”时不再重复执行 pm list；
+    connect/disconnect/restart_server 会清空缓存。
+    """
+    cached = _cached_packages(device_id, third_party)
+    if cached is not None:
+        return cached
+    args = _list_packages_args(third_party)
     code, out = _run_adb(args, timeout_s=30, device_id=device_id)
+    return _parse_and_cache_packages(
+        code, out, device_id=device_id, third_party=third_party, raise_on_error=raise_on_error
+    )
+
+
+def _parse_package_list(code: int, out: str, *, raise_on_error: bool) -> list[str]:
     if code != 0:
         if raise_on_error:
             raise RuntimeError(out or "adb shell pm list packages 执行失败")
@@ -138,13 +372,8 @@ def list_packages(
     return pkgs
 
 
-def _package_label(pkg: str, *, device_id: str | None = None) -> str | None:
-    # 尝试从 dumpsys 中获取 application-label
-    cmd = ["shell", "dumpsys", "package", pkg]
-    code, out = _run_adb(cmd, timeout_s=8, device_id=device_id)
-    if code != 0 or not out:
-        return None
-    for ln in out.splitlines():
+def _label_from_dumpsys(lines: list[str]) -> str | None:
+    for ln in lines:
         ln = ln.strip()
         if "application-label:" in ln:
             return ln.split("application-label:", 1)[1].strip()
@@ -153,6 +382,58 @@ def _package_label(pkg: str, *, device_id: str | None = None) -> str | None:
     return None
 
 
+_LABEL_MARKER = "@@pkg:"
+_LABEL_BATCH_SIZE = 50
+# 在设备端先过滤输出，只回传第一条 label 行（完整输出可达数十 KB）；grep 命中即退出，
+# 上游 dump 随之提前结束
+_LABEL_GREP = 'grep -m 1 -E "application-label(-zh)?:"'
+
+
+def _label_script(pkg_expr: str) -> str:
+    """
+    设备端获取单个包 label 的脚本：优先 `cmd package dump`（比 dumpsys 少一层服务转发），
+    旧系统不支持或无结果时回退 dumpsys。pkg_expr 须为已校验的包名或 shell 变量引用。
+    """
+    return (
+        f"l=$(cmd package dump {pkg_expr} 2>/dev/null | {_LABEL_GREP}); "
+        f'[ -n "$l" ] || l=$(dumpsys package {pkg_expr} | {_LABEL_GREP}); '
+        'echo "$l"'
+    )
+
+
+def _is_safe_package(pkg: str) -> bool:
+    return bool(pkg) and all(ch.isalnum() or ch in "._" for ch in pkg)
+
+
+def _package_labels_batch(pkgs: list[str], *, device_id: str | None = None) -> dict[str, str]:
+    """
+    在一次 `adb shell` 中批量获取多个包的 application-label，避免每个包单独拉起一次 adb。
+    输出格式：每个包先打印 `@@pkg:<包名>`，随后是匹配到的 label 行。
+    """
+    safe = [p for p in pkgs if _is_safe_package(p)]
+    if not safe:
+        return {}
+    body = _label_script('"$p"')
+    script = f"for p in {' '.join(safe)}; do echo \"{_LABEL_MARKER}$p\"; {body}; done"
+    code, out = _run_adb(["shell", script], timeout_s=max(15, 2 * len(safe)), device_id=device_id)
+    if code != 0 and not out:
+        return {}
+    labels: dict[str, str] = {}
+    current: str | None = None
+    buf: list[str] = []
+    for ln in out.splitlines() + [_LABEL_MARKER]:
+        if ln.startswith(_LABEL_MARKER):
+            if current is not None:
+                label = _label_from_dumpsys(buf)
+                if label:
+                    labels[current] = label
+            current = ln[len(_LABEL_MARKER) :].strip() or None
+            buf = []
+            continue
+        buf.append(ln)
+    return labels
+
+
 def list_packages_with_labels(
     third_party: bool = True,
     limit: int | None = None,
@@ -163,31 +444,51 @@ def list_packages_with_labels(
     pkgs = list_packages(third_party=third_party, device_id=device_id, raise_on_error=raise_on_error)
     if limit is not None:
         pkgs = pkgs[:limit]
-    result: list[dict[str, str]] = []
-    for pkg in pkgs:
-        label = _package_label(pkg, device_id=device_id) or ""
-        result.append({"package": pkg, "label": label})
-    return result
+    labels, misses = label_cache.get_labels(device_id, pkgs)
+    fetched: dict[str, str] = {}
+    for i in range(0, len(misses), _LABEL_BATCH_SIZE):
+        batch = misses[i : i + _LABEL_BATCH_SIZE]
+        found = _package_labels_batch(batch, device_id=device_id)
+        # 未取到 label 的包也记为空字符串，避免每次刷新都重新 dumpsys
+        fetched.update({p: found.get(p, "") for p in batch})
+    if fetched or limit is None:
+        label_cache.put_labels(device_id, fetched, installed=pkgs if limit is None else None)
+    labels.update(fetched)
+    return [{"package": pkg, "label": labels.get(pkg, "")} for pkg in pkgs]
 
 
 def shell(cmd: str, timeout_s: int = 20, *, device_id: str | None = None) -> tuple[bool, str]:
+    """
+    执行任意 `adb shell <cmd>`（如任务中的 adb_shell 步骤）。命令来自用户，未闭合的引号/heredoc
+    会吞掉常驻会话的结束标记、一直等到超时，因此固定走一次性 adb shell，出错立即返回。
+    """
     rc, out = _run_adb(["shell", cmd], timeout_s=timeout_s, device_id=device_id)
     return rc == 0, out
 
 
+def _session_shell(cmd: str, timeout_s: int = 20, *, device_id: str | None = None) -> tuple[bool, str]:
+    """内部拼接的固定命令（参数均已校验/转义）走常驻会话。"""
+    rc, out = _run_shell(cmd, timeout_s=timeout_s, device_id=device_id)
+    return rc == 0, out
+
+
 def shell_argv(argv: list[str], timeout_s: int = 20, *, device_id: str | None = None) -> tuple[bool, str]:
     """
     以参数数组方式执行 `adb shell ...`，避免把带空格的整条命令作为单一参数传入时的兼容性问题。
     """
-    rc, out = _run_adb(["shell", *argv], timeout_s=timeout_s, device_id=device_id)
+    # adb 本身也是以空格拼接 shell 参数后交给设备端 sh 解析，这里保持一致
+    rc, out = _run_shell(" ".join(argv), timeout_s=timeout_s, device_id=device_id)
     return rc == 0, out
 
 
+_NEWLINE_TO_SPACE = str.maketrans({"\r": " ", "\n": " "})
+
+
 def input_text(text: str, *, device_id: str | None = None) -> tuple[bool, str]:
-    # 使用 shell 转义规避命令注入，同时去掉换行符避免意外分行
-    sanitized = text.replace("\r", " ").replace("\n", " ")
-    safe = shlex.quote(sanitized)
-    return shell(f"input text {safe}", device_id=device_id)
+    # adb shell 总会把参数拼接后交给设备端 sh 解析（常驻会话同理），因此仍需 shell 转义规避命令注入；
+    # 同时去掉换行符避免意外分行
+    safe = shlex.quote(text.translate(_NEWLINE_TO_SPACE))
+    return shell_argv(["input", "text", safe], device_id=device_id)
 
 
 def tap(x: int, y: int, *, device_id: str | None = None) -> tuple[bool, str]:
@@ -209,15 +510,58 @@ def swipe(
     )
 
 
+_KEY_NUM_RE = re.compile(r"\d+")
+_KEY_NAME_RE = re.compile(r"KEYCODE_[A-Z0-9_]+")
+
+
+def _valid_keyevent(key: str) -> bool:
+    return bool(_KEY_NUM_RE.fullmatch(key) or _KEY_NAME_RE.fullmatch(key))
+
+
 def keyevent(key: str, *, device_id: str | None = None) -> tuple[bool, str]:
     key = str(key or "").strip()
     if not key:
         return False, "invalid keyevent"
-    if not (re.fullmatch(r"\d+", key) or re.fullmatch(r"KEYCODE_[A-Z0-9_]+", key)):
+    if not _valid_keyevent(key):
         return False, "invalid keyevent"
     return shell_argv(["input", "keyevent", key], device_id=device_id)
 
 
+def _action_command(action: dict[str, Any]) -> str:
+    kind = str(action.get("type", "") or "").strip()
+    if kind == "tap":
+        return f"input tap {int(action.get('x', 0))} {int(action.get('y', 0))}"
+    if kind == "swipe":
+        coords = [int(action.get(k, 0)) for k in ("x1", "y1", "x2", "y2")]
+        duration_ms = int(action.get("duration_ms", 300))
+        return "input swipe " + " ".join(str(v) for v in coords) + f" {duration_ms}"
+    if kind == "keyevent":
+        key = str(action.get("key", "") or "").strip()
+        if not _valid_keyevent(key):
+            raise ValueError(f"invalid keyevent: {key}")
+        return f"input keyevent {key}"
+    if kind == "text":
+        return f"input text {shlex.quote(str(action.get('text', '')).translate(_NEWLINE_TO_SPACE))}"
+    if kind == "sleep":
+        ms = max(int(action.get("ms", 0)), 0)
+        return f"sleep {ms / 1000:.3f}"
+    raise ValueError(f"unknown action type: {kind}")
+
+
+def batch_actions(actions: list[dict[str, Any]], *, device_id: str | None = None, timeout_s: int = 60) -> tuple[bool, str]:
+    """
+    把多条 tap/swipe/keyevent/text/sleep 动作合并为一条设备端脚本，在一次 `adb shell` 中依次执行，
+    任一动作失败即停止（&&）。所有参数按单个动作接口的规则校验，避免命令注入。
+    """
+    if not actions:
+        return True, ""
+    try:
+        script = " && ".join(_action_command(a) for a in actions)
+    except (TypeError, ValueError) as e:
+        return False, str(e)
+    return _session_shell(script, timeout_s=timeout_s, device_id=device_id)
+
+
 def start_app(
     package: str, activity: str | None = None, action: str = "auto", *, device_id: str | None = None
 ) -> tuple[bool, str]:
@@ -256,14 +600,41 @@ def tcpip(port: int = 5555, *, device_id: str | None = None) -> tuple[bool, str]
     return rc == 0, out
 
 
+_IPV4_RE = re.compile(r"\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b")
+
+
+_WIFI_IP_TTL_S = 30.0
+_wifi_ip_cache: dict[str | None, tuple[str, float]] = {}
+
+
+def _clear_device_caches() -> None:
+    # 设备连接状态变化（含重启 adb server）后，adb 版本探测、在线设备列表以及按设备缓存的 WiFi IP、包列表都可能失效
+    global _online_cache, _version_cache
+    _online_cache = None
+    _version_cache = None
+    _wifi_ip_cache.clear()
+    _packages_cache.clear()
+
+
 def get_wifi_ip(*, device_id: str | None = None) -> str | None:
     """
     尽量获取设备 WiFi IP，优先 route src，并跳过常见的移动网络接口。
-    参考 AutoGLM-GUI 的 adb_plus/ip.py，但不引入额外依赖。
+    成功结果按设备缓存 30 秒；connect/disconnect/restart_server 会清空缓存。
     """
+    cached = _wifi_ip_cache.get(device_id)
+    if cached and monotonic() - cached[1] < _WIFI_IP_TTL_S:
+        return cached[0]
+    ip = _probe_wifi_ip(device_id=device_id)
+    if ip:
+        _wifi_ip_cache[device_id] = (ip, monotonic())
+    return ip
+
+
+def _probe_wifi_ip(*, device_id: str | None = None) -> str | None:
+    """参考 AutoGLM-GUI 的 adb_plus/ip.py，但不引入额外依赖。"""
 
     def _extract_ipv4(text: str) -> str | None:
-        m = re.search(r"\\b(?:[0-9]{1,3}\\.){3}[0-9]{1,3}\\b", text or "")
+        m = _IPV4_RE.search(text or "")
         if not m:
             return None
         ip = m.group(0)
@@ -272,7 +643,7 @@ def get_wifi_ip(*, device_id: str | None = None) -> str | None:
         return ip
 
     try:
-        ok, out = shell("ip -4 route get 8.8.8.8", timeout_s=6, device_id=device_id)
+        ok, out = _session_shell("ip -4 route get 8.8.8.8", timeout_s=6, device_id=device_id)
         if ok and out:
             for line in out.splitlines():
                 if " src " not in line:
@@ -299,7 +670,7 @@ def get_wifi_ip(*, device_id: str | None = None) -> str | None:
         pass
 
     try:
-        ok, out = shell("ip -4 addr show wlan0", timeout_s=6, device_id=device_id)
+        ok, out = _session_shell("ip -4 addr show wlan0", timeout_s=6, device_id=device_id)
         if ok and out:
             return _extract_ipv4(out)
     except Exception:
@@ -325,6 +696,17 @@ def connect_wifi(*, device_id: str | None = None, port: int = 5555) -> tuple[boo
     return ok2, msg, addr
 
 
+def connect_wifi_many(device_ids: list[str], *, port: int = 5555) -> list[tuple[bool, str, str | None]]:
+    """
+    对多个 USB 设备并发执行 connect_wifi，结果顺序与 device_ids 一致。
+    单个设备内的 读取 IP -> tcpip -> connect 存在先后依赖（tcpip 会重启 adbd），仍保持串行。
+    """
+    if not device_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=min(8, len(device_ids))) as ex:
+        return list(ex.map(lambda d: connect_wifi(device_id=d, port=port), device_ids))
+
+
 def _run_adb_bytes(args: list[str], timeout_s: int = 10, *, device_id: str | None = None) -> tuple[int, bytes, str]:
     try:
         proc = subprocess.run(
@@ -332,13 +714,9 @@ def _run_adb_bytes(args: list[str], timeout_s: int = 10, *, device_id: str | Non
             capture_output=True,
             timeout=timeout_s,
         )
-        stdout = proc.stdout if isinstance(proc.stdout, (bytes, bytearray)) else b""
-        stderr = (
-            proc.stderr.decode("utf-8", errors="replace")
-            if isinstance(proc.stderr, (bytes, bytearray))
-            else str(proc.stderr or "")
-        )
-        return proc.returncode, bytes(stdout), (stderr or "").strip()
+        # text=False 时 stdout/stderr 必为 bytes，直接返回以免复制整张截图
+        stderr = proc.stderr.decode("utf-8", errors="replace").strip() if proc.stderr else ""
+        return proc.returncode, proc.stdout or b"", stderr
     except FileNotFoundError:
         return 127, b"", _adb_not_found_message()
     except subprocess.TimeoutExpired:
@@ -350,53 +728,279 @@ def _run_adb_bytes(args: list[str], timeout_s: int = 10, *, device_id: str | Non
 PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
 
 
+# screencap 原始输出中 4 字节/像素的格式：RGBA_8888=1, RGBX_8888=2
+_RAW_RGBA_FORMATS = {1, 2}
+_RAW_FORMAT_RGBX = 2
+
+
+def _parse_raw_screencap(data: bytes) -> tuple[bool, int, int, memoryview, str]:
+    if len(data) < 12:
+        return False, 0, 0, memoryview(b""), "截图数据过短"
+    w, h, fmt = struct.unpack_from("<III", data, 0)
+    header = len(data) - w * h * 4
+    if w <= 0 or h <= 0 or fmt not in _RAW_RGBA_FORMATS or header not in (12, 16):
+        return False, 0, 0, memoryview(b""), "截图格式异常（不支持的 screencap 原始格式）"
+    if fmt == _RAW_FORMAT_RGBX:
+        # RGBX 的第 4 字节未定义，按 RGBA 编码前需统一置为不透明，否则截图可能显示为透明
+        pixels = bytearray(memoryview(data)[header:])
+        pixels[3::4] = b"\xff" * (w * h)
+        return True, w, h, memoryview(pixels), "ok"
+    return True, w, h, memoryview(data)[header:], "ok"
+
+
+def screenshot_raw(
+    *, device_id: str | None = None, timeout_s: int = 10
+) -> tuple[bool, int, int, memoryview, str]:
+    """
+    使用 `adb exec-out screencap`（不带 -p）获取原始像素，省去设备端的 PNG 压缩。
+    返回 (ok, width, height, rgba_pixels, message)。头部为 <width, height, format>，
+    Android 10 起额外带 4 字节 colorspace，这里按数据长度自动识别 12/16 字节头。
+    """
+    rc, data, err = _run_adb_bytes(["exec-out", "screencap"], timeout_s=timeout_s, device_id=device_id)
+    if rc != 0 or not data:
+        return False, 0, 0, memoryview(b""), err or f"exec-out failed rc={rc}"
+    return _parse_raw_screencap(data)
+
+
+def screenshot_raw_gz(
+    *, device_id: str | None = None, timeout_s: int = 10
+) -> tuple[bool, int, int, memoryview, str]:
+    """
+    同 screenshot_raw，但在设备端经 `gzip -1` 压缩后传输、主机侧解压，
+    以少量设备 CPU 换取无线 ADB 下约数倍的传输量下降。
+    """
+    rc, data, err = _run_adb_bytes(
+        ["exec-out", "screencap | gzip -1"], timeout_s=timeout_s, device_id=device_id
+    )
+    if rc != 0 or not data:
+        return False, 0, 0, memoryview(b""), err or f"exec-out failed rc={rc}"
+    try:
+        raw = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    except zlib.error as e:
+        return False, 0, 0, memoryview(b""), f"截图解压失败: {e}"
+    return _parse_raw_screencap(raw)
+
+
+def _png_chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(body, zlib.crc32(kind)))
+
+
+def encode_png(width: int, height: int, rgba: bytes | memoryview, *, level: int = 1) -> bytes:
+    """在主机侧把 RGBA 像素编码为 PNG（每行 filter=None，低压缩级别换取速度）。"""
+    stride = width * 4
+    rows: list[bytes | memoryview] = []
+    for y in range(height):
+        rows.append(b"\x00")
+        rows.append(rgba[y * stride : (y + 1) * stride])
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"".join(
+        [
+            PNG_SIGNATURE,
+            _png_chunk(b"IHDR", ihdr),
+            _png_chunk(b"IDAT", zlib.compress(b"".join(rows), level)),
+            _png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+def _raw_screencap_mode() -> str:
+    """AUTOGLM_SCREENCAP_RAW：1/true/yes 拉取原始像素，gzip 则设备端压缩后传输，其余为关闭。"""
+    mode = os.environ.get("AUTOGLM_SCREENCAP_RAW", "").strip().lower()
+    if mode in {"1", "true", "yes"}:
+        return "raw"
+    if mode == "gzip":
+        return "gzip"
+    return ""
+
+
 def screenshot_png(*, device_id: str | None = None, timeout_s: int = 10, retries: int = 1) -> tuple[bool, bytes, str]:
     """
     使用 `adb exec-out screencap -p` 截图，返回 (ok, png_bytes, message)。
     参考 AutoGLM-GUI 的 adb_plus/screenshot.py，但不引入 PIL。
+    设置 AUTOGLM_SCREENCAP_RAW=1（或 gzip）时改为拉取原始像素并在主机侧编码 PNG（失败则回退 -p）。
     """
+    mode = _raw_screencap_mode()
+    if mode:
+        grab = screenshot_raw_gz if mode == "gzip" else screenshot_raw
+        ok, w, h, pixels, _ = grab(device_id=device_id, timeout_s=timeout_s)
+        if ok:
+            return True, encode_png(w, h, pixels), "ok"
     attempts = max(1, int(retries) + 1)
     last_err = ""
     for _ in range(attempts):
-        rc, data, err = _run_adb_bytes(
-            ["exec-out", "screencap", "-p"], timeout_s=timeout_s, device_id=device_id
-        )
-        if rc != 0 or not data:
-            last_err = err or f"exec-out failed rc={rc}"
-            continue
-        if len(data) <= len(PNG_SIGNATURE) + 8 or not data.startswith(PNG_SIGNATURE):
-            last_err = "截图格式异常（PNG signature 不匹配）"
-            continue
-        return True, data, "ok"
+        rc, data, err = _run_adb_bytes(_SCREENCAP_PNG_ARGS, timeout_s=timeout_s, device_id=device_id)
+        last_err = _check_png_capture(rc, data, err)
+        if not last_err:
+            return True, data, "ok"
     return False, b"", last_err or "截图失败"
 
 
+_SCREENCAP_PNG_ARGS = ["exec-out", "screencap", "-p"]
+
+
+def _check_png_capture(rc: int, data: bytes, err: str) -> str:
+    """校验一次 `screencap -p` 的结果，正常返回空字符串，否则返回错误信息。"""
+    if rc != 0 or not data:
+        return err or f"exec-out failed rc={rc}"
+    if len(data) <= len(PNG_SIGNATURE) + 8 or data[:8] != PNG_SIGNATURE:
+        return "截图格式异常（PNG signature 不匹配）"
+    return ""
+
+
+def _png_dimensions_unchecked(png: bytes) -> tuple[int | None, int | None]:
+    """调用方已校验 PNG signature（如 screenshot_png 的返回值）时直接读取 IHDR 宽高。"""
+    # signature(8) + length(4) + type(4) => IHDR data starts at 16
+    if len(png) < 24 or png[12:16] != b"IHDR":
+        return None, None
+    w, h = struct.unpack_from(">II", png, 16)
+    if w <= 0 or h <= 0:
+        return None, None
+    return w, h
+
+
 def png_dimensions(png: bytes) -> tuple[int | None, int | None]:
     """从 PNG IHDR 解析宽高，无需 Pillow。"""
     try:
-        if not png.startswith(PNG_SIGNATURE):
+        if png[:8] != PNG_SIGNATURE:
             return None, None
-        # signature(8) + length(4) + type(4) => IHDR data starts at 16
-        if len(png) < 24:
-            return None, None
-        if png[12:16] != b"IHDR":
-            return None, None
-        w = int.from_bytes(png[16:20], "big", signed=False)
-        h = int.from_bytes(png[20:24], "big", signed=False)
-        if w <= 0 or h <= 0:
-            return None, None
-        return w, h
+        return _png_dimensions_unchecked(png)
     except Exception:
         return None, None
 
 
 def screenshot_base64(
     *, device_id: str | None = None, timeout_s: int = 10, retries: int = 1
-) -> tuple[bool, str, dict[str, int | None], str]:
+) -> tuple[bool, bytes, dict[str, int | None], str]:
+    """
+    返回 (ok, base64_bytes, {"width", "height"}, message)。
+    base64 结果保持为 ASCII bytes，需要 str 的调用方自行 decode，避免不需要时多分配一份。
+    """
     ok, png, msg = screenshot_png(device_id=device_id, timeout_s=timeout_s, retries=retries)
     if not ok:
-        return False, "", {"width": None, "height": None}, msg
-    w, h = png_dimensions(png)
-    b64 = b64encode(png).decode("ascii")
-    return True, b64, {"width": w, "height": h}, "ok"
+        return False, b"", {"width": None, "height": None}, msg
+    w, h = _png_dimensions_unchecked(png)
+    return True, b64encode(memoryview(png)), {"width": w, "height": h}, "ok"
+
 
+# ---- 异步版本：基于 asyncio 子进程，便于在单个事件循环中并发查询多台设备 ----
+
+
+async def _run_adb_bytes_async(
+    args: list[str], timeout_s: int = 10, *, device_id: str | None = None
+) -> tuple[int, bytes, str]:
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *_adb_base_args(device_id),
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        return 127, b"", _adb_not_found_message()
+    except Exception as e:
+        return 1, b"", f"adb 执行失败: {e}"
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout_s)
+    except asyncio.TimeoutError:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        return 124, b"", f"adb 执行超时（>{timeout_s}s）：{' '.join(_adb_base_args(device_id) + args)}"
+    err = stderr.decode("utf-8", errors="replace").strip() if stderr else ""
+    return proc.returncode or 0, stdout or b"", err
+
+
+async def _run_adb_async(args: list[str], timeout_s: int = 20, *, device_id: str | None = None) -> tuple[int, str]:
+    rc, stdout, err = await _run_adb_bytes_async(args, timeout_s=timeout_s, device_id=device_id)
+    # 与 _run_adb 一致：stdout 与 stderr 直接拼接（不插入分隔符）后整体 strip
+    out = stdout.decode("utf-8", errors="replace")
+    return _check_device_gone(rc, (out + err if err else out).strip())
+
+
+async def devices_async(*, raise_on_error: bool = False) -> list[AdbDevice]:
+    code, out = await _run_adb_async(["devices", "-l"], timeout_s=20)
+    return _remember_online(code, _parse_devices(code, out, raise_on_error=raise_on_error))
+
+
+async def online_serials_async() -> list[str]:
+    cached = _cached_online()
+    if cached is not None:
+        return cached
+    return [d.serial for d in await devices_async(raise_on_error=False) if d.status == "device"]
+
+
+async def pair_async(host_port: str, code: str) -> tuple[bool, str]:
+    rc, out = await _run_adb_async(["pair", host_port, code], timeout_s=60)
+    return rc == 0, out
+
+
+async def connect_async(host_port: str) -> tuple[bool, str]:
+    _clear_device_caches()
+    rc, out = await _run_adb_async(["connect", host_port], timeout_s=30)
+    return rc == 0, out
+
+
+async def disconnect_async(host_port: str | None = None) -> tuple[bool, str]:
+    _close_shell_sessions()
+    _clear_device_caches()
+    args = ["disconnect"] if not host_port else ["disconnect", host_port]
+    rc, out = await _run_adb_async(args, timeout_s=30)
+    return rc == 0, out
+
+
+async def restart_server_async() -> tuple[bool, str]:
+    _close_shell_sessions()
+    _clear_device_caches()
+    rc1, out1 = await _run_adb_async(["kill-server"], timeout_s=10)
+    rc2, out2 = await _run_adb_async(["start-server"], timeout_s=10)
+    ok = rc1 == 0 and rc2 == 0
+    out = "\n".join([s for s in [out1, out2] if s]).strip()
+    return ok, out
+
+
+async def version_async() -> tuple[bool, str]:
+    cached = _cached_version()
+    if cached is not None:
+        return cached
+    rc, out = await _run_adb_async(["version"], timeout_s=8)
+    return _remember_version(rc, out)
+
+
+async def list_packages_async(
+    third_party: bool = True, *, device_id: str | None = None, raise_on_error: bool = False
+) -> list[str]:
+    cached = _cached_packages(device_id, third_party)
+    if cached is not None:
+        return cached
+    code, out = await _run_adb_async(_list_packages_args(third_party), timeout_s=30, device_id=device_id)
+    return _parse_and_cache_packages(
+        code, out, device_id=device_id, third_party=third_party, raise_on_error=raise_on_error
+    )
+
+
+async def screenshot_png_async(
+    *, device_id: str | None = None, timeout_s: int = 10, retries: int = 1
+) -> tuple[bool, bytes, str]:
+    if _raw_screencap_mode():
+        # 原始像素 + 主机侧 PNG 编码是 CPU 密集的，放到线程里执行以免阻塞事件循环
+        return await asyncio.to_thread(screenshot_png, device_id=device_id, timeout_s=timeout_s, retries=retries)
+    attempts = max(1, int(retries) + 1)
+    last_err = ""
+    for _ in range(attempts):
+        rc, data, err = await _run_adb_bytes_async(_SCREENCAP_PNG_ARGS, timeout_s=timeout_s, device_id=device_id)
+        last_err = _check_png_capture(rc, data, err)
+        if not last_err:
+            return True, data, "ok"
+    return False, b"", last_err or "截图失败"
+
+
+async def screenshot_base64_async(
+    *, device_id: str | None = None, timeout_s: int = 10, retries: int = 1
+) -> tuple[bool, bytes, dict[str, int | None], str]:
+    ok, png, msg = await screenshot_png_async(device_id=device_id, timeout_s=timeout_s, retries=retries)
+    if not ok:
+        return False, b"", {"width": None, "height": None}, msg
+    w, h = _png_dimensions_unchecked(png)
+    return True, b64encode(memoryview(png)), {"width": w, "height": h}, "ok"
@@ -3,6 +3,7 @@ from __future__ import annotations
 import ast
 import os
 import re
+import threading
 from pathlib import Path
 from pprint import pformat
 from typing import Dict, Tuple
@@ -18,7 +19,7 @@ def apps_file() -> Path:
 
 def _extract_dict_legacy(text: str) -> Dict[str, str]:
     # 兼容性兜底：尝试解析 APP_PACKAGES = {...}
-    m = re.search(r"APP_PACKAGES\\s*=\\s*(\\{.*?\\})", text, re.S)
+    m = re.search(r"APP_PACKAGES\s*=\s*(\{.*?\})", text, re.S)
     if not m:
         return {}
     body = m.group(1)
@@ -31,19 +32,84 @@ def _extract_dict_legacy(text: str) -> Dict[str, str]:
     return {}
 
 
-def _find_app_packages_value(tree: ast.AST) -> ast.AST | None:
-    for node in ast.walk(tree):
+# 快速路径：从头扫描源码，整段跳过字符串与注释（其中的括号、以及 docstring 里示例写法的
+# `APP_PACKAGES = {` 都不计入），找到括号层级为 0 的行首赋值（允许类型注解）后配对括号，
+# 只对字典字面量做 literal_eval
+_SCAN_RE = re.compile(
+    r"""[rRbBuU]{0,2}(?:'''(?:\\.|[^\\])*?'''|\"\"\"(?:\\.|[^\\])*?\"\"\"|'(?:\\.|[^\\'\n])*'|"(?:\\.|[^\\"\n])*")"""
+    r"|#[^\n]*"
+    r"|(?P<assign>^APP_PACKAGES[ \t]*(?::[^=\n]*)?=[ \t]*(?=\{))"
+    r"|(?P<open>[{\[(])"
+    r"|(?P<close>[}\])])",
+    re.S | re.M,
+)
+
+
+def _find_assign_value(text: str) -> int:
+    """返回模块级 `APP_PACKAGES = {` 中 "{" 的下标；找不到时返回 -1。"""
+    depth = 0
+    for m in _SCAN_RE.finditer(text):
+        if m.group("assign") is not None:
+            if depth == 0:
+                return m.end()
+        elif m.group("open"):
+            depth += 1
+        elif m.group("close"):
+            depth -= 1
+    return -1
+
+
+def _match_brace(text: str, start: int) -> int:
+    """text[start] 为 "{"，返回与之配对的 "}" 之后的下标；括号不配对时返回 -1。"""
+    depth = 0
+    for m in _SCAN_RE.finditer(text, start):
+        if m.group("open"):
+            depth += 1
+        elif m.group("close"):
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    return -1
+
+
+def _extract_dict_fast(text: str) -> Tuple[Dict[str, str], tuple[int, int]] | None:
+    start = _find_assign_value(text)
+    if start < 0:
+        return None
+    end = _match_brace(text, start)
+    if end < 0:
+        return None
+    try:
+        parsed = ast.literal_eval(text[start:end])
+    except Exception:
+        return None
+    if not isinstance(parsed, dict):
+        return None
+    return {str(k): str(v) for k, v in parsed.items()}, (start, end)
+
+
+def _find_app_packages_value(tree: ast.Module) -> ast.AST | None:
+    # APP_PACKAGES 是模块级赋值，只需看顶层语句，不必遍历函数/类内部的全部节点
+    for node in tree.body:
         if isinstance(node, ast.Assign):
             for target in node.targets:
                 if isinstance(target, ast.Name) and target.id == "APP_PACKAGES":
                     return node.value
-        if isinstance(node, ast.AnnAssign):
+        elif isinstance(node, ast.AnnAssign):
             if isinstance(node.target, ast.Name) and node.target.id == "APP_PACKAGES":
                 return node.value
     return None
 
 
-def _extract_dict_and_span(text: str) -> Tuple[Dict[str, str], tuple[int, int, int, int] | None]:
+def _extract_dict_and_span(text: str) -> Tuple[Dict[str, str], tuple[int, int] | None]:
+    """
+    返回 (APP_PACKAGES 内容, 字典字面量在 text 中的字符区间 [start, end))。
+    常见的 `APP_PACKAGES = {...}` 走快速路径，其他写法再回退到整文件 ast.parse。
+    """
+    fast = _extract_dict_fast(text)
+    if fast is not None:
+        return fast
+
     try:
         tree = ast.parse(text)
     except Exception:
@@ -68,30 +134,66 @@ def _extract_dict_and_span(text: str) -> Tuple[Dict[str, str], tuple[int, int, i
         end_line = int(getattr(value, "end_lineno"))
         end_col = int(getattr(value, "end_col_offset"))
         if start_line > 0 and end_line > 0:
-            span = (start_line, start_col, end_line, end_col)
+            offsets = _line_offsets(text)
+            span = (
+                _index_from_line_col(text, offsets, start_line, start_col),
+                _index_from_line_col(text, offsets, end_line, end_col),
+            )
     except Exception:
         span = None
 
     return data, span
 
 
-def load_app_packages() -> Dict[str, str]:
-    path = apps_file()
-    if not path.exists():
-        return {}
+# 已解析的 APP_PACKAGES，按 (路径, mtime_ns, size) 失效；只在持有 _lock 时读写
+_lock = threading.Lock()
+_packages_cache: tuple[tuple[str, int, int], Dict[str, str]] | None = None
+
+
+def _file_key(path: Path) -> tuple[str, int, int] | None:
     try:
-        text = path.read_text(encoding="utf-8", errors="replace")
-    except Exception:
-        return {}
-    data, _ = _extract_dict_and_span(text)
-    return data
+        st = path.stat()
+    except OSError:
+        return None
+    return str(path), st.st_mtime_ns, st.st_size
 
 
-def _index_from_line_col(lines: list[str], line: int, col: int) -> int:
-    # line: 1-based, col: 0-based
-    if line <= 1:
-        return col
-    return sum(len(lines[i]) for i in range(line - 1)) + col
+def load_app_packages() -> Dict[str, str]:
+    global _packages_cache
+    path = apps_file()
+    with _lock:
+        key = _file_key(path)
+        if key is None:
+            return {}
+        cached = _packages_cache
+        if cached is not None and cached[0] == key:
+            return dict(cached[1])
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except Exception:
+            return {}
+        data, _ = _extract_dict_and_span(text)
+        _packages_cache = (key, data)
+        return dict(data)
+
+
+def _line_offsets(text: str) -> list[int]:
+    """各行起始位置的字符下标：第 n 行（1-based）从 offsets[n - 1] 开始。"""
+    offsets = [0]
+    i = text.find("\n")
+    while i >= 0:
+        offsets.append(i + 1)
+        i = text.find("\n", i + 1)
+    return offsets
+
+
+def _index_from_line_col(text: str, offsets: list[int], line: int, col: int) -> int:
+    # line: 1-based；col: ast 给出的 UTF-8 字节偏移，行内有中文等非 ASCII 字符时需换算为字符偏移
+    start = offsets[line - 1]
+    if text[start : start + col].isascii():
+        return start + col
+    end = offsets[line] if line < len(offsets) else len(text)
+    return start + len(text[start:end].encode("utf-8")[:col].decode("utf-8", errors="ignore"))
 
 
 def add_entries(entries: Dict[str, str]) -> Dict[str, str]:
@@ -109,24 +211,25 @@ def add_entries(entries: Dict[str, str]) -> Dict[str, str]:
     if not path.exists():
         raise FileNotFoundError(f"未找到 apps.py: {path}")
 
-    text = path.read_text(encoding="utf-8", errors="replace")
-    data, span = _extract_dict_and_span(text)
-    if span is None:
-        raise RuntimeError("未在 apps.py 中定位到 APP_PACKAGES 字典，无法自动写入，请手动编辑")
+    global _packages_cache
+    with _lock:
+        text = path.read_text(encoding="utf-8", errors="replace")
+        data, span = _extract_dict_and_span(text)
+        if span is None:
+            raise RuntimeError("未在 apps.py 中定位到 APP_PACKAGES 字典，无法自动写入，请手动编辑")
 
-    data.update({str(k): str(v) for k, v in entries.items()})
+        data.update({str(k): str(v) for k, v in entries.items()})
 
-    formatted = pformat(data, width=100, sort_dicts=True)
-    start_line, start_col, end_line, end_col = span
-    indent = " " * max(start_col, 0)
-    if "\n" in formatted:
-        formatted = formatted.replace("\n", "\n" + indent)
+        formatted = pformat(data, width=100, sort_dicts=True)
+        start, end = span
+        indent = " " * (start - (text.rfind("\n", 0, start) + 1))
+        if "\n" in formatted:
+            formatted = formatted.replace("\n", "\n" + indent)
 
-    lines = text.splitlines(keepends=True)
-    start = _index_from_line_col(lines, start_line, start_col)
-    end = _index_from_line_col(lines, end_line, end_col)
-    new_text = text[:start] + formatted + text[end:]
+        new_text = text[:start] + formatted + text[end:]
 
-    path.write_text(new_text, encoding="utf-8")
+        path.write_text(new_text, encoding="utf-8")
+        # 写入后直接刷新缓存，下次读取无需重新解析
+        key = _file_key(path)
+        _packages_cache = (key, dict(data)) if key is not None else None
     return data
-
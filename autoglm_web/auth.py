@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
 
-from fastapi import Header, HTTPException
+from fastapi import HTTPException
 
 from .security import token_matches
 
@@ -12,7 +14,7 @@ class AuthResult:
     token: str
 
 
-def require_token(authorization: str | None = Header(default=None)) -> AuthResult:
+def _authenticate(authorization: str | None) -> AuthResult:
     if not authorization:
         raise HTTPException(status_code=401, detail="缺少 Authorization 请求头")
     parts = authorization.split(" ", 1)
@@ -23,3 +25,50 @@ def require_token(authorization: str | None = Header(default=None)) -> AuthResul
         raise HTTPException(status_code=403, detail="Token 无效")
     return AuthResult(token=provided)
 
+
+# 无需鉴权的 /api 路径（页面本身与静态资源不在 /api 下，同样放行）
+PUBLIC_API_PATHS = frozenset({"/api/info"})
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class TokenAuthMiddleware:
+    """
+    纯 ASGI 鉴权中间件：统一校验 /api/* 的 Bearer Token，失败时直接返回 JSON 错误，
+    成功时把 AuthResult 放入 scope["state"]["auth"]（即 request.state.auth）。
+    相比在每个路由上声明鉴权依赖，省去逐路由的依赖解析开销。
+    """
+
+    def __init__(self, app: Callable[[Scope, Receive, Send], Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/") or path in PUBLIC_API_PATHS:
+            await self.app(scope, receive, send)
+            return
+        authorization = None
+        for name, value in scope.get("headers") or []:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        try:
+            result = _authenticate(authorization)
+        except HTTPException as e:
+            body = json.dumps({"detail": e.detail}, ensure_ascii=False).encode("utf-8")
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": e.status_code,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode("ascii")),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+        scope.setdefault("state", {})["auth"] = result
+        await self.app(scope, receive, send)
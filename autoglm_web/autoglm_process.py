@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import ctypes
 import os
+import select
 import signal
 import threading
 import time
 import subprocess
 from dataclasses import dataclass
 from pathlib import Path
+from typing import TextIO
 
 from .config import AutoglmConfig
 
@@ -27,6 +30,22 @@ def pid_file() -> Path:
     return _state_dir() / "autoglm.pid"
 
 
+def _write_pid_file(pid: int) -> None:
+    # 临时文件创建时即为 0600，再原子替换：不存在权限过宽的窗口，读取方也不会读到写了一半的内容
+    path = pid_file()
+    tmp = path.with_suffix(".tmp")
+    try:
+        tmp.unlink()  # 上次异常退出残留的临时文件
+    except FileNotFoundError:
+        pass
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, 0o600)
+    try:
+        os.write(fd, f"{pid}\n".encode())
+    finally:
+        os.close(fd)
+    os.replace(tmp, path)
+
+
 def log_file() -> Path:
     return _state_dir() / "autoglm.log"
 
@@ -47,6 +66,41 @@ def _is_running(pid: int) -> bool:
         return False
 
 
+def _wait_exit(pid: int, timeout_s: float) -> bool:
+    """
+    等待 pid 退出，返回是否已退出。
+    本进程启动的子进程直接 wait（同时回收僵尸进程，否则 os.kill(pid, 0) 会一直认为它仍在运行）；
+    其他进程（如上次 Web 服务留下的 pid）优先用 pidfd 等待内核通知，不支持时每 0.2 秒轮询。
+    """
+    proc = _proc
+    if proc is not None and proc.pid == pid:
+        try:
+            proc.wait(timeout=timeout_s)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+    pidfd_open = getattr(os, "pidfd_open", None)
+    if pidfd_open is not None:
+        try:
+            fd = pidfd_open(pid)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            fd = -1
+        if fd >= 0:
+            try:
+                readable, _, _ = select.select([fd], [], [], timeout_s)
+                return bool(readable)
+            finally:
+                os.close(fd)
+    deadline = time.monotonic() + timeout_s
+    while _is_running(pid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.2)
+    return True
+
+
 def status() -> ProcessStatus:
     global _proc
     with _lock:
@@ -57,7 +111,11 @@ def status() -> ProcessStatus:
                 pid = int(pid_file().read_text(encoding="utf-8").strip())
             except Exception:
                 pid = None
-        running = bool(pid) and _is_running(pid)
+        if _proc and _proc.pid == pid:
+            # 自己启动的子进程用 poll 判断（同时回收僵尸进程）
+            running = _proc.poll() is None
+        else:
+            running = bool(pid) and _is_running(pid)
         if pid and not running:
             try:
                 pid_file().unlink()
@@ -138,11 +196,7 @@ def start(cfg: AutoglmConfig) -> tuple[bool, str]:
             return False, f"启动失败: {e}"
 
         _proc = proc
-        pid_file().write_text(str(proc.pid) + "\n", encoding="utf-8")
-        try:
-            pid_file().chmod(0o600)
-        except Exception:
-            pass
+        _write_pid_file(proc.pid)
         log_fp.write(f"\n[autoglm-web] started pid={proc.pid} at {time.strftime('%F %T')}\n")
         log_fp.flush()
         log_fp.close()
@@ -161,15 +215,12 @@ def stop() -> tuple[bool, str]:
         except Exception as e:
             return False, f"停止失败: {e}"
 
-        for _ in range(30):
-            if not _is_running(pid):
-                break
-            time.sleep(0.2)
-        if _is_running(pid):
+        if not _wait_exit(pid, 6.0):
             try:
                 os.kill(pid, signal.SIGKILL)
             except Exception:
                 pass
+            _wait_exit(pid, 1.0)
 
         try:
             pid_file().unlink()
@@ -184,17 +235,104 @@ def stop() -> tuple[bool, str]:
         return True, "已停止"
 
 
-def tail_log(offset: int, max_bytes: int = 32_000) -> tuple[int, str]:
+# append_log 复用的追加写文件对象：(fp, st_dev, st_ino)。日志被删除或替换（inode 变化）时重新打开
+_append_fp: tuple[TextIO, int, int] | None = None
+_append_lock = threading.Lock()
+
+
+def append_log(line: str) -> None:
+    """向日志追加一行（不含换行符）。Web 端任务与调度的日志都经由这里写入，不再每行打开/关闭一次文件。"""
+    append_log_lines([line])
+
+
+def append_log_lines(lines: list[str]) -> None:
+    """一次写入多行（如 AutoGLM 的多行输出），合并为一次 write，中间不会插入其他线程的日志。"""
+    global _append_fp
+    if not lines:
+        return
     lf = log_file()
-    if not lf.exists():
-        return 0, ""
-    size = lf.stat().st_size
-    if offset < 0 or offset > size:
-        offset = max(0, size - max_bytes)
-    with lf.open("rb") as f:
-        f.seek(offset)
-        data = f.read(max_bytes)
-        new_offset = offset + len(data)
+    with _append_lock:
+        cur = _append_fp
+        try:
+            st = os.stat(lf)
+            same = cur is not None and cur[1] == st.st_dev and cur[2] == st.st_ino
+        except OSError:
+            same = False
+        if not same:
+            if cur is not None:
+                _append_fp = None
+                try:
+                    cur[0].close()
+                except Exception:
+                    pass
+            lf.parent.mkdir(parents=True, exist_ok=True)
+            fp = lf.open("a", encoding="utf-8")
+            fst = os.fstat(fp.fileno())
+            cur = _append_fp = (fp, fst.st_dev, fst.st_ino)
+        cur[0].write("".join(f"{ln}\n" for ln in lines))
+        cur[0].flush()
+
+
+# tail_log 复用的只读 fd：(fd, st_dev, st_ino)。日志被删除或替换（inode 变化）时重新打开。
+# pread 也在锁内执行，避免另一线程重开时关闭 fd 导致读到被复用的 fd 号
+_log_fd: tuple[int, int, int] | None = None
+_log_fd_lock = threading.Lock()
+
+
+def _open_log_fd(path: Path) -> int | None:
+    """返回与当前日志文件对应的 fd（调用方需持有 _log_fd_lock），文件不存在时返回 None。"""
+    global _log_fd
+    cur = _log_fd
+    try:
+        st = os.stat(path)
+    except OSError:
+        # 日志已被删除：释放旧 fd，不再占用已删除文件的空间
+        if cur is not None:
+            _log_fd = None
+            try:
+                os.close(cur[0])
+            except OSError:
+                pass
+        return None
+    if cur is not None and cur[1] == st.st_dev and cur[2] == st.st_ino:
+        return cur[0]
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+    except OSError:
+        return None
+    if cur is not None:
+        try:
+            os.close(cur[0])
+        except OSError:
+            pass
+    fst = os.fstat(fd)
+    _log_fd = (fd, fst.st_dev, fst.st_ino)
+    return fd
+
+
+def log_end_offset() -> int:
+    """当前日志末尾的 offset（之后的 tail_log 从这里开始收集新输出），日志不存在时为 0。"""
+    with _log_fd_lock:
+        fd = _open_log_fd(log_file())
+        return os.fstat(fd).st_size if fd is not None else 0
+
+
+def tail_log(offset: int, max_bytes: int = 32_000) -> tuple[int, str]:
+    """
+    从 offset 读取日志增量，返回 (新 offset, 文本)。offset 越界（如日志被截断）时从末尾 max_bytes 处重新开始。
+    日志流与交互会话会频繁轮询：复用常驻 fd 并用 os.pread 定位读取，没有新内容时不发生读操作。
+    """
+    with _log_fd_lock:
+        fd = _open_log_fd(log_file())
+        if fd is None:
+            return 0, ""
+        size = os.fstat(fd).st_size
+        if offset < 0 or offset > size:
+            offset = max(0, size - max_bytes)
+        if offset == size:
+            return offset, ""
+        data = os.pread(fd, max_bytes, offset)
+    new_offset = offset + len(data)
     try:
         text = data.decode("utf-8", errors="replace")
     except Exception:
@@ -202,6 +340,75 @@ def tail_log(offset: int, max_bytes: int = 32_000) -> tuple[int, str]:
     return new_offset, text
 
 
+_IN_MODIFY = 0x00000002
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+
+
+def _inotify_watch_dir(path: Path) -> int | None:
+    """为目录创建 inotify fd（非阻塞），监视其中文件的写入/新建/改名；系统不支持时返回 None。"""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except Exception:
+        return None
+    if fd < 0:
+        return None
+    try:
+        wd = libc.inotify_add_watch(fd, os.fsencode(path), _IN_MODIFY | _IN_CREATE | _IN_MOVED_TO)
+    except Exception:
+        wd = -1
+    if wd < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class LogWaiter:
+    """
+    等待 AutoGLM 日志出现新写入：Linux（含 Termux）上用 inotify 监视日志目录，写入后立即唤醒，
+    不必固定休眠一段时间再检查；不支持 inotify 时退化为短暂休眠。
+    目录内其他文件的变化也会唤醒，调用方醒来后照常 tail_log 即可。每个实例只供一个线程使用，用完需 close()。
+    """
+
+    # 兜底：即使没有收到事件也定期醒来检查一次；无 inotify 时的轮询间隔
+    _MAX_WAIT_S = 1.0
+    _POLL_S = 0.25
+
+    def __init__(self) -> None:
+        self._fd = _inotify_watch_dir(log_file().parent)
+
+    def wait(self, timeout_s: float) -> None:
+        fd = self._fd
+        if fd is None:
+            time.sleep(min(max(timeout_s, 0.0), self._POLL_S))
+            return
+        readable, _, _ = select.select([fd], [], [], min(max(timeout_s, 0.0), self._MAX_WAIT_S))
+        if readable:
+            # 清空事件队列，只关心“有变化”这一点
+            try:
+                while os.read(fd, 4096):
+                    pass
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+
+    def __enter__(self) -> LogWaiter:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+# send_input 在进程仍在运行、但本进程没有其 stdin 句柄（如 Web 服务重启前启动的进程）时返回的提示，
+# 调用方据此判断是否需要重启 AutoGLM
+HANDLE_GONE_MSG = "进程句柄不可用，请尝试重新启动 AutoGLM"
+
+
 def send_input(text: str) -> tuple[bool, str]:
     """向已运行的 AutoGLM 进程发送一行输入（需先通过 start 启动）"""
     with _lock:
@@ -209,7 +416,7 @@ def send_input(text: str) -> tuple[bool, str]:
         if not st.running:
             return False, "AutoGLM 未在运行，请先启动"
         if _proc is None or _proc.poll() is not None or _proc.stdin is None:
-            return False, "进程句柄不可用，请尝试重新启动 AutoGLM"
+            return False, HANDLE_GONE_MSG
         try:
             _proc.stdin.write(text + "\n")
             _proc.stdin.flush()
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import Any
 
@@ -177,11 +177,39 @@ def read_config() -> AutoglmConfig:
     return AutoglmConfig.from_mapping(merged)
 
 
+_cfg_cache: tuple[tuple[str, int, int], AutoglmConfig] | None = None
+
+
+def read_config_cached() -> AutoglmConfig:
+    """
+    按 (路径, mtime_ns, size) 缓存 read_config() 的结果：文件未变化时只需一次 stat。
+    返回副本，调用方修改不会污染缓存。
+    """
+    global _cfg_cache
+    path = config_sh_path()
+    try:
+        st = path.stat()
+    except OSError:
+        return read_config()
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    cached = _cfg_cache
+    if cached is None or cached[0] != key:
+        cached = (key, read_config())
+        _cfg_cache = cached
+    return replace(cached[1])
+
+
+def _invalidate_config_cache() -> None:
+    global _cfg_cache
+    _cfg_cache = None
+
+
 def write_config(updated: AutoglmConfig) -> None:
     path = config_sh_path()
     path.parent.mkdir(parents=True, exist_ok=True)
     content = "\n".join(updated.to_export_lines())
     path.write_text(content, encoding="utf-8")
+    _invalidate_config_cache()
     try:
         path.chmod(0o600)
     except Exception:
@@ -218,4 +246,5 @@ def update_device_id(device_id: str) -> None:
     if not updated:
         new_lines.append(f"export PHONE_AGENT_DEVICE_ID={_shell_single_quote(device_id)}")
     path.write_text("\n".join(new_lines) + "\n", encoding="utf-8")
+    _invalidate_config_cache()
 
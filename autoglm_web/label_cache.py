@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+_lock = threading.Lock()
+
+LABEL_TTL_S = 24 * 3600
+
+
+def _web_dir() -> Path:
+    base = Path(os.environ.get("AUTOGLM_HOME", str(Path.home() / ".autoglm"))).expanduser()
+    return base / "web"
+
+
+def label_cache_path() -> Path:
+    return _web_dir() / "package_labels.json"
+
+
+def _load_json(path: Path) -> dict[str, dict[str, dict[str, Any]]]:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _dump_json(path: Path, data: dict[str, dict[str, dict[str, Any]]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def get_labels(device_id: str | None, pkgs: list[str]) -> tuple[dict[str, str], list[str]]:
+    """
+    按 (device_id, package) 查询未过期的 label 缓存，返回 (命中的 label, 未命中的包名)。
+    """
+    now = int(time.time())
+    with _lock:
+        entries = _load_json(label_cache_path()).get(device_id or "", {})
+    hits: dict[str, str] = {}
+    misses: list[str] = []
+    for pkg in pkgs:
+        ent = entries.get(pkg)
+        if isinstance(ent, dict) and now - int(ent.get("ts", 0) or 0) < LABEL_TTL_S:
+            hits[pkg] = str(ent.get("label", "") or "")
+        else:
+            misses.append(pkg)
+    return hits, misses
+
+
+def put_labels(device_id: str | None, labels: dict[str, str], installed: list[str] | None = None) -> None:
+    """
+    写入新查询到的 label；传入 installed（当前 pm list 结果）时，顺带清理已卸载包的缓存。
+    """
+    now = int(time.time())
+    with _lock:
+        data = _load_json(label_cache_path())
+        entries = data.get(device_id or "", {})
+        before = len(entries)
+        if installed is not None:
+            keep = set(installed)
+            entries = {k: v for k, v in entries.items() if k in keep}
+        if not labels and len(entries) == before:
+            return
+        for pkg, label in labels.items():
+            entries[pkg] = {"label": label or "", "ts": now}
+        data[device_id or ""] = entries
+        try:
+            _dump_json(label_cache_path(), data)
+        except Exception:
+            pass
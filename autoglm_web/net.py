@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import socket
+from time import monotonic
 
 
-def guess_lan_ip() -> str | None:
-    """
-    尽量获取局域网可访问的 IPv4 地址。
-    说明：通过 UDP “伪连接”获取路由出口 IP，不会实际发送数据包。
-    """
+# 局域网 IP 可能随 Wi-Fi 切换变化，只做短时缓存；网络变化后可调用 invalidate_lan_ip() 立即重新探测
+_LAN_IP_TTL_S = 60.0
+_lan_ip_cache: tuple[str | None, float] | None = None
+
+
+def _probe_lan_ip() -> str | None:
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
@@ -22,6 +24,25 @@ def guess_lan_ip() -> str | None:
     return None
 
 
+def guess_lan_ip() -> str | None:
+    """
+    尽量获取局域网可访问的 IPv4 地址。
+    说明：通过 UDP “伪连接”获取路由出口 IP，不会实际发送数据包。结果缓存 60 秒。
+    """
+    global _lan_ip_cache
+    cached = _lan_ip_cache
+    if cached is not None and monotonic() - cached[1] < _LAN_IP_TTL_S:
+        return cached[0]
+    ip = _probe_lan_ip()
+    _lan_ip_cache = (ip, monotonic())
+    return ip
+
+
+def invalidate_lan_ip() -> None:
+    global _lan_ip_cache
+    _lan_ip_cache = None
+
+
 def candidate_urls(host: str, port: int) -> list[str]:
     host = (host or "").strip()
     try:
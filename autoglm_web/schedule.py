@@ -2,16 +2,29 @@ from __future__ import annotations
 
 import datetime as _dt
 import json
+import os
 import threading
 import time
 import uuid
+from bisect import bisect_left
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Callable
 
+try:
+    # 可选依赖：orjson 解析/序列化更快；Termux 上需要编译，可能装不上，没有则回退到标准库 json
+    import orjson
+except ImportError:
+    orjson = None
+
 _lock = threading.Lock()
 _runner: Callable[[str, dict[str, Any]], list[dict[str, Any]]] | None = None
 _thread: threading.Thread | None = None
 _stop_event = threading.Event()
+# 调度被新增/修改/删除或需要停止时置位，让休眠中的调度线程立即重新计算
+_wake_event = threading.Event()
+# 没有任何可触发的调度时，调度线程最长休眠时间（也兜底手动修改 schedules.json 的情况）
+_MAX_IDLE_S = 60.0
 
 
 def _web_dir() -> Path:
@@ -26,12 +39,9 @@ def schedules_path() -> Path:
 
 def _log_line(text: str) -> None:
     try:
-        from .autoglm_process import log_file
+        from .autoglm_process import append_log
 
-        lf = log_file()
-        lf.parent.mkdir(parents=True, exist_ok=True)
-        with lf.open("a", encoding="utf-8") as f:
-            f.write(f"[{_now_beijing().strftime('%F %T')}] [scheduler] {text}\n")
+        append_log(f"[{_now_beijing().strftime('%F %T')}] [scheduler] {text}")
     except Exception:
         pass
 
@@ -40,6 +50,8 @@ def _load_json(path: Path) -> list[dict[str, Any]]:
     if not path.exists():
         return []
     try:
+        if orjson is not None:
+            return orjson.loads(path.read_bytes())
         return json.loads(path.read_text(encoding="utf-8"))
     except Exception:
         return []
@@ -48,13 +60,73 @@ def _load_json(path: Path) -> list[dict[str, Any]]:
 def _dump_json(path: Path, data: list[dict[str, Any]]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp = path.with_suffix(".tmp")
-    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    if orjson is not None:
+        # orjson 直接输出 UTF-8 字节（非 ASCII 字符原样保留），与下面 json.dump 的格式一致
+        tmp.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        # 直接编码写入文件，不在内存中先拼出完整 JSON 字符串
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
     tmp.replace(path)
 
 
+# 已解析的 schedules.json 及按 id 的索引，按 (路径, mtime_ns, size) 失效；只在持有 _lock 时读写
+_schedules_cache: tuple[tuple[str, int, int], list[dict[str, Any]], dict[str, dict[str, Any]]] | None = None
+
+
+def _file_key(path: Path) -> tuple[str, int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return str(path), st.st_mtime_ns, st.st_size
+
+
+def _remember(key: tuple[str, int, int] | None, items: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    global _schedules_cache
+    by_id = {str(it.get("id") or ""): it for it in items if isinstance(it, dict)}
+    _schedules_cache = (key, items, by_id) if key is not None else None
+    return by_id
+
+
+def _load_state() -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """
+    读取调度列表及 id 索引（调用方需持有 _lock）。文件未变化时复用上次解析结果，
+    调度线程每秒一次的轮询与列表/保存接口都不必重新读取并解析 JSON。
+    """
+    path = schedules_path()
+    key = _file_key(path)
+    if key is None:
+        return [], {}
+    cached = _schedules_cache
+    if cached is not None and cached[0] == key:
+        return cached[1], cached[2]
+    items = _load_json(path)
+    return items, _remember(key, items)
+
+
+def _load_schedules() -> list[dict[str, Any]]:
+    return _load_state()[0]
+
+
+def _save_schedules(items: list[dict[str, Any]]) -> None:
+    path = schedules_path()
+    _dump_json(path, items)
+    _remember(_file_key(path), items)
+
+
 def list_schedules() -> list[dict[str, Any]]:
+    # 返回浅拷贝，调用方改写字段不会污染缓存
+    with _lock:
+        return [dict(it) for it in _load_schedules()]
+
+
+def get_schedule(sched_id: str) -> dict[str, Any] | None:
+    if not sched_id:
+        return None
     with _lock:
-        return _load_json(schedules_path())
+        item = _load_state()[1].get(sched_id)
+        return dict(item) if item is not None else None
 
 
 def _find_index(items: list[dict[str, Any]], sched_id: str) -> int:
@@ -66,7 +138,7 @@ def _find_index(items: list[dict[str, Any]], sched_id: str) -> int:
 
 def upsert_schedule(sched: dict[str, Any]) -> dict[str, Any]:
     with _lock:
-        items = _load_json(schedules_path())
+        items = list(_load_schedules())
         if not sched.get("id"):
             sched["id"] = uuid.uuid4().hex
         # 规范化字段
@@ -75,46 +147,67 @@ def upsert_schedule(sched: dict[str, Any]) -> dict[str, Any]:
         sched.setdefault("history", [])
         idx = _find_index(items, sched["id"])
         if idx >= 0:
-            items[idx] = sched
+            items[idx] = dict(sched)
         else:
-            items.append(sched)
-        _dump_json(schedules_path(), items)
-        return sched
+            items.append(dict(sched))
+        _save_schedules(items)
+    _wake_event.set()
+    return sched
+
+
+# 等待写盘的运行状态：sched_id -> (last_run_ts, history)。多个任务几乎同时结束时，
+# 先拿到 _lock 的线程把队列里的全部更新一次写入，其余线程发现自己的更新已落盘便直接返回
+_pending_runs: dict[str, tuple[int, list[dict[str, Any]]]] = {}
+_pending_lock = threading.Lock()
 
 
 def update_schedule_run_state(sched_id: str, last_run_ts: int, history: list[dict[str, Any]]) -> bool:
     if not sched_id:
         return False
+    with _pending_lock:
+        _pending_runs[sched_id] = (int(last_run_ts or 0), history or [])
     with _lock:
-        items = _load_json(schedules_path())
-        idx = _find_index(items, sched_id)
-        if idx < 0:
-            return False
-        item = items[idx]
-        item["last_run_ts"] = int(last_run_ts or 0)
-        item["history"] = history or []
-        items[idx] = item
-        _dump_json(schedules_path(), items)
-        return True
+        with _pending_lock:
+            pending = dict(_pending_runs)
+            _pending_runs.clear()
+        items, by_id = _load_state()
+        if pending and not pending.keys().isdisjoint(by_id):
+            new_items = []
+            for it in items:
+                upd = pending.get(str(it.get("id") or ""))
+                if upd is not None:
+                    it = dict(it)
+                    it["last_run_ts"], it["history"] = upd
+                new_items.append(it)
+            _save_schedules(new_items)
+        return sched_id in by_id
 
 
 def delete_schedule(sched_id: str) -> bool:
     with _lock:
-        items = _load_json(schedules_path())
+        items = _load_schedules()
         new_items = [it for it in items if it.get("id") != sched_id]
         changed = len(new_items) != len(items)
         if changed:
-            _dump_json(schedules_path(), new_items)
-        return changed
+            _save_schedules(new_items)
+    if changed:
+        _wake_event.set()
+    return changed
 
 
-def _parse_field(field: str, min_v: int, max_v: int) -> set[int]:
+_CRON_RANGES = ((0, 59), (0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# 单独一个 "*" 的字段直接复用这些只读集合，不再每次新建
+_ALL_BY_RANGE = {r: frozenset(range(r[0], r[1] + 1)) for r in set(_CRON_RANGES)}
+
+
+def _parse_field(field: str, min_v: int, max_v: int) -> set[int] | frozenset[int]:
     """
     解析单个 cron 字段，支持 *, */n, 逗号、范围。输入已 strip。
+    返回值为 "*" 时是共享的 frozenset，调用方不得修改。
     """
     values: set[int] = set()
     if field == "*":
-        return set(range(min_v, max_v + 1))
+        return _ALL_BY_RANGE.get((min_v, max_v)) or frozenset(range(min_v, max_v + 1))
     for part in field.split(","):
         part = part.strip()
         if not part:
@@ -150,88 +243,93 @@ def _parse_field(field: str, min_v: int, max_v: int) -> set[int]:
     return values
 
 
-def _matches(cron: str, dt: _dt.datetime) -> bool:
-    """
-    6 字段秒级 cron: sec min hour dom month dow（周日=0/7）。要求全部匹配。
-    """
-    parts = [p.strip() for p in cron.strip().split()]
-    if len(parts) != 6:
-        return False
-    sec_s, min_s, hour_s, dom_s, month_s, dow_s = parts
-    try:
-        sec_ok = dt.second in _parse_field(sec_s, 0, 59)
-        min_ok = dt.minute in _parse_field(min_s, 0, 59)
-        hour_ok = dt.hour in _parse_field(hour_s, 0, 23)
-        dom_ok = dt.day in _parse_field(dom_s, 1, 31)
-        month_ok = dt.month in _parse_field(month_s, 1, 12)
-        dow_vals = _parse_field(dow_s, 0, 7)
-        cron_dow = (dt.weekday() + 1) % 7  # 周日=0，其余 1-6
-        if 7 in dow_vals:
-            dow_vals.add(0)
-        dow_ok = cron_dow in dow_vals
-        return bool(sec_ok and min_ok and hour_ok and dom_ok and month_ok and dow_ok)
-    except Exception:
-        return False
+def is_valid_cron(expr: str) -> bool:
+    return _cron_sets(expr) is not None
 
 
-def is_valid_cron(expr: str) -> bool:
-    parts = expr.strip().split()
-    if len(parts) != 6:
-        return False
-    ranges = [(0, 59), (0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
-    for field, (lo, hi) in zip(parts, ranges):
-        if not _parse_field(field.strip(), lo, hi):
-            return False
-    return True
+CronSets = tuple[frozenset[int], frozenset[int], frozenset[int], frozenset[int], frozenset[int], frozenset[int]]
 
 
-def _cron_sets(expr: str) -> tuple[set[int], set[int], set[int], set[int], set[int], set[int]] | None:
+@lru_cache(maxsize=256)
+def _cron_sets(expr: str) -> CronSets | None:
+    """
+    解析 6 字段 cron 为各字段取值集合，非法返回 None。
+    结果只取决于表达式字符串，按字符串缓存，同一表达式在进程内只解析一次；返回 frozenset 防止调用方改动缓存。
+    """
     parts = expr.strip().split()
     if len(parts) != 6:
         return None
-    ranges = [(0, 59), (0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
-    values: list[set[int]] = []
-    for field, (lo, hi) in zip(parts, ranges):
+    values: list[frozenset[int]] = []
+    for field, (lo, hi) in zip(parts, _CRON_RANGES):
         parsed = _parse_field(field.strip(), lo, hi)
         if not parsed:
             return None
-        values.append(parsed)
+        values.append(frozenset(parsed))
     return values[0], values[1], values[2], values[3], values[4], values[5]
 
 
-def next_run_ts(expr: str, now: _dt.datetime | None = None, max_scan_seconds: int = 31 * 24 * 3600) -> int:
+@lru_cache(maxsize=256)
+def _cron_sorted(
+    expr: str,
+) -> tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...], frozenset[int], frozenset[int], frozenset[int]] | None:
+    """next_run_ts 所需形式：时/分/秒为升序元组（供二分查找），周字段的 7 已并入 0。"""
     fields = _cron_sets(expr)
     if not fields:
-        return 0
+        return None
     sec_set, min_set, hour_set, dom_set, month_set, dow_set = fields
     if 7 in dow_set:
-        dow_set = set(dow_set)
-        dow_set.add(0)
+        dow_set = dow_set | {0}
+    return tuple(sorted(hour_set)), tuple(sorted(min_set)), tuple(sorted(sec_set)), dom_set, month_set, dow_set
+
+
+def _first_time_at_or_after(
+    hours: tuple[int, ...], minutes: tuple[int, ...], seconds: tuple[int, ...], h0: int, m0: int, s0: int
+) -> tuple[int, int, int] | None:
+    """在升序的 时/分/秒 候选值中找出不早于 h0:m0:s0 的最小时刻，当天没有则返回 None。"""
+    for h in hours[bisect_left(hours, h0):]:
+        if h > h0:
+            return h, minutes[0], seconds[0]
+        for m in minutes[bisect_left(minutes, m0):]:
+            if m > m0:
+                return h, m, seconds[0]
+            k = bisect_left(seconds, s0)
+            if k < len(seconds):
+                return h, m, seconds[k]
+    return None
+
+
+def next_run_ts(expr: str, now: _dt.datetime | None = None, max_scan_seconds: int = 31 * 24 * 3600) -> int:
+    """
+    计算严格晚于 now 的下一次触发时间戳，超出 max_scan_seconds 仍未命中则返回 0。
+    按天跳过 月/日/周 不匹配的日期，命中的那天再用二分查找定位 时→分→秒，不逐秒扫描。
+    """
+    fields = _cron_sorted(expr)
+    if not fields:
+        return 0
+    hours, minutes, seconds, dom_set, month_set, dow_set = fields
     if now is None:
         now = _now_beijing()
-    start = now + _dt.timedelta(seconds=1)
-    for offset in range(max_scan_seconds):
-        dt = start + _dt.timedelta(seconds=offset)
-        if dt.second not in sec_set:
-            continue
-        if dt.minute not in min_set:
-            continue
-        if dt.hour not in hour_set:
-            continue
-        if dt.day not in dom_set:
-            continue
-        if dt.month not in month_set:
-            continue
-        cron_dow = (dt.weekday() + 1) % 7
-        if cron_dow not in dow_set:
-            continue
-        return int(dt.timestamp())
+    start = (now + _dt.timedelta(seconds=1)).replace(microsecond=0)
+    limit = start + _dt.timedelta(seconds=max_scan_seconds)
+    day = start.replace(hour=0, minute=0, second=0)
+    h0, m0, s0 = start.hour, start.minute, start.second
+    while day < limit:
+        cron_dow = (day.weekday() + 1) % 7
+        if day.month in month_set and day.day in dom_set and cron_dow in dow_set:
+            hms = _first_time_at_or_after(hours, minutes, seconds, h0, m0, s0)
+            if hms is not None:
+                dt = day.replace(hour=hms[0], minute=hms[1], second=hms[2])
+                return int(dt.timestamp()) if dt < limit else 0
+        day += _dt.timedelta(days=1)
+        h0 = m0 = s0 = 0
     return 0
 
 
+_BEIJING_TZ = _dt.timezone(_dt.timedelta(hours=8))
+
+
 def _now_beijing() -> _dt.datetime:
-    tz = _dt.timezone(_dt.timedelta(hours=8))
-    return _dt.datetime.now(tz=tz)
+    return _dt.datetime.now(tz=_BEIJING_TZ)
 
 
 def configure_runner(fn: Callable[[str, dict[str, Any]], list[dict[str, Any]]]) -> None:
@@ -240,7 +338,7 @@ def configure_runner(fn: Callable[[str, dict[str, Any]], list[dict[str, Any]]])
 
 
 def _record_result(sched: dict[str, Any], ok: bool, output: str) -> None:
-    history = sched.get("history") or []
+    history = list(sched.get("history") or [])
     entry = {
         "ts": int(_now_beijing().timestamp()),
         "ok": bool(ok),
@@ -271,41 +369,112 @@ def _run_once(sched: dict[str, Any]) -> None:
         _record_result(sched, False, str(e))
 
 
+# next_run_ts 只向后查找 31 天；查不到时（如 2 月 29 日）每天重新计算一次，而不是永远不再触发
+_RESCAN_S = 24 * 3600
+# 唤醒晚于触发时刻超过该秒数（如设备休眠）时视为错过，不补跑
+_LATE_GRACE_S = 5
+
+
+def _next_fire(cron: str, after: _dt.datetime) -> tuple[str, int, bool]:
+    """返回 (cron, 时间戳, 是否为真实触发时刻)；查不到下一次触发时给出 _RESCAN_S 之后的重新计算时刻。"""
+    ts = next_run_ts(cron, after)
+    if ts:
+        return cron, ts, True
+    return cron, int(after.timestamp()) + _RESCAN_S, False
+
+
+def _schedule_workers() -> int:
+    try:
+        return max(1, int(os.environ.get("AUTOGLM_SCHEDULE_WORKERS", "1") or 1))
+    except ValueError:
+        return 1
+
+
+# 到点的调度在独立线程中执行，调度线程只负责按时派发，长任务不会让其他调度错过触发时刻。
+# 同时执行的任务数默认 1（多个任务同时操作同一台手机会互相干扰），多设备时可通过 AUTOGLM_SCHEDULE_WORKERS 调大。
+# 到点时没有空闲名额就跳过本次触发（与 _LATE_GRACE_S 一致：不排队、不补跑）
+_run_slots = threading.BoundedSemaphore(_schedule_workers())
+# task_id -> 占用标记；同一任务不并发，用 dict.setdefault 原子占用，无需额外加锁
+_running_tasks: dict[str, object] = {}
+
+
+def _run_job(sched: dict[str, Any], task_id: str) -> None:
+    """执行一次调度；调用前已占用 _running_tasks[task_id] 与一个 _run_slots 名额，结束时释放。"""
+    try:
+        _run_once(sched)
+        update_schedule_run_state(
+            str(sched.get("id") or ""),
+            int(sched.get("last_run_ts", 0) or 0),
+            sched.get("history") or [],
+        )
+    except Exception:
+        pass
+    finally:
+        _run_slots.release()
+        _running_tasks.pop(task_id, None)
+
+
 def _tick_loop() -> None:
-    running_tasks: set[str] = set()
+    # sched_id -> _next_fire() 结果；只由调度线程读写。每次唤醒只需比较整数，cron 变化时重新计算
+    next_fire: dict[str, tuple[str, int, bool]] = {}
     while not _stop_event.is_set():
-        now = _now_beijing()
+        wait_s = 1.0
         try:
             items = list_schedules()
+            now = _now_beijing()
+            now_ts = int(now.timestamp())
+            live: set[str] = set()
             for sched in items:
                 if not sched.get("enabled", True):
                     continue
+                sched_id = str(sched.get("id") or "")
                 cron = str(sched.get("cron", "") or "").strip()
                 task_id = str(sched.get("task_id", "") or "").strip()
                 if not cron or not task_id:
                     continue
-                # 跳过同一任务并发
-                if task_id in running_tasks:
+                live.add(sched_id)
+                entry = next_fire.get(sched_id)
+                if entry is None or entry[0] != cron:
+                    # 新出现或 cron 被修改：从上一秒开始算，当前这一秒命中时同样触发
+                    entry = next_fire[sched_id] = _next_fire(cron, now - _dt.timedelta(seconds=1))
+                _, due, real = entry
+                if now_ts < due:
+                    continue
+                next_fire[sched_id] = _next_fire(cron, now)
+                if not real or now_ts - due > _LATE_GRACE_S:
                     continue
                 last_ts = int(sched.get("last_run_ts", 0) or 0)
-                if int(now.timestamp()) == last_ts:
+                if now_ts == last_ts:
+                    continue
+                # 跳过同一任务并发：占用失败说明该任务仍在执行
+                claim = object()
+                if _running_tasks.setdefault(task_id, claim) is not claim:
                     continue
-                if not _matches(cron, now):
+                if not _run_slots.acquire(blocking=False):
+                    _running_tasks.pop(task_id, None)
+                    _log_line(f"{sched_id} -> SKIP（已有其他定时任务在执行，AUTOGLM_SCHEDULE_WORKERS 名额已满）")
                     continue
-                running_tasks.add(task_id)
                 try:
-                    _run_once(sched)
-                    update_schedule_run_state(
-                        str(sched.get("id") or ""),
-                        int(sched.get("last_run_ts", 0) or 0),
-                        sched.get("history") or [],
-                    )
-                finally:
-                    running_tasks.discard(task_id)
+                    threading.Thread(
+                        target=_run_job, args=(sched, task_id), name="autoglm-schedule-run", daemon=True
+                    ).start()
+                except RuntimeError:
+                    _run_slots.release()
+                    _running_tasks.pop(task_id, None)
+                    raise
+            for sched_id in [k for k in next_fire if k not in live]:
+                del next_fire[sched_id]
+            # 休眠到最近一次触发（或重新计算）时刻，而不是每秒醒来检查一遍
+            if next_fire:
+                soonest = min(e[1] for e in next_fire.values())
+                wait_s = min(max(soonest - time.time(), 0.05), _MAX_IDLE_S)
+            else:
+                wait_s = _MAX_IDLE_S
         except Exception:
             # 守护线程保持运行
             pass
-        time.sleep(1)
+        _wake_event.wait(wait_s)
+        _wake_event.clear()
 
 
 def ensure_scheduler_started() -> None:
@@ -319,5 +488,6 @@ def ensure_scheduler_started() -> None:
 
 def stop_scheduler() -> None:
     _stop_event.set()
+    _wake_event.set()
     if _thread and _thread.is_alive():
         _thread.join(timeout=2)
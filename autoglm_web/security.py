@@ -28,13 +28,38 @@ def load_or_create_token() -> str:
 
 
 def reset_token() -> str:
+    global _token_cache
     path = token_path()
     if path.exists():
         path.unlink()
+    _token_cache = None
     return load_or_create_token()
 
 
+_token_cache: tuple[tuple[str, int, int], str] | None = None
+
+
+def cached_token() -> str:
+    """
+    进程内缓存 Token，仅当文件 (路径, mtime_ns, inode) 变化时重新读取，
+    因此在另一个进程执行 `autoglm-web reset-token` 后也会立即生效。
+    """
+    global _token_cache
+    path = token_path()
+    try:
+        st = path.stat()
+    except OSError:
+        return load_or_create_token()
+    key = (str(path), st.st_mtime_ns, st.st_ino)
+    cached = _token_cache
+    if cached is None or cached[0] != key:
+        cached = (key, path.read_text(encoding="utf-8").strip())
+        _token_cache = cached
+    return cached[1]
+
+
 def token_matches(provided: str) -> bool:
-    expected = load_or_create_token()
-    return secrets.compare_digest(provided, expected)
+    expected = cached_token()
+    # 按 bytes 比较：compare_digest 对含非 ASCII 字符的 str 会抛 TypeError
+    return secrets.compare_digest(provided.encode("utf-8"), expected.encode("utf-8"))
 
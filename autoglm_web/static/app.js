@@ -0,0 +1,1287 @@
+const LS_TOKEN_KEY = "autoglm_web_token";
+const LS_TAB_KEY = "autoglm_web_tab";
+let logOffset = 0;
+let follow = true;
+let sessionId = "";
+let tasksCache = [];
+let tasksById = new Map();
+let schedulesById = new Map();
+let screenAuto = false;
+let screenTimer = 0;
+let screenMeta = { width: 0, height: 0, device_id: "" };
+let screenFailCount = 0;
+let screenTapInflight = false;
+let packagesCache = [];
+// 脚本以 defer 加载，执行时 DOM 已解析完成
+const SCREEN_CANVAS = document.getElementById("screenCanvas");
+let screenDrawn = false;
+
+function authHeader() {
+  const t = localStorage.getItem(LS_TOKEN_KEY) || "";
+  return t ? { "Authorization": "Bearer " + t } : {};
+}
+
+// 导航按钮与标签页一一对应，首次使用时缓存，切换时按名字直接定位
+const TABS = {};
+
+function tabEntries() {
+  if (!Object.keys(TABS).length) {
+    document.querySelectorAll(".navbtn").forEach(btn => {
+      TABS[btn.dataset.tab] = { btn, tab: document.getElementById("tab-" + btn.dataset.tab) };
+    });
+  }
+  return TABS;
+}
+
+function showTab(name) {
+  for (const [key, ent] of Object.entries(tabEntries())) {
+    const active = key === name;
+    ent.btn.classList.toggle("active", active);
+    if (ent.tab) ent.tab.classList.toggle("active", active);
+  }
+  try { localStorage.setItem(LS_TAB_KEY, name); } catch (e) { }
+}
+
+function initTabs() {
+  const saved = (localStorage.getItem(LS_TAB_KEY) || "").trim();
+  const name = saved || "screen";
+  showTab(name);
+}
+
+function hasToken() {
+  return !!((localStorage.getItem(LS_TOKEN_KEY) || "").trim());
+}
+
+function setMsg(id, msg) {
+  const el = document.getElementById(id);
+  if (el) el.textContent = msg || "";
+}
+
+function saveToken() {
+  const t = document.getElementById("token").value.trim();
+  if (!t) return;
+  localStorage.setItem(LS_TOKEN_KEY, t);
+  refreshAll();
+}
+
+function clearToken() {
+  localStorage.removeItem(LS_TOKEN_KEY);
+  document.getElementById("token").value = "";
+  setMsg("configMsg", "Token 已清除");
+}
+
+async function apiJson(path, options={}) {
+  const headers = Object.assign({ "Content-Type": "application/json" }, authHeader(), options.headers || {});
+  const resp = await fetch(path, Object.assign({}, options, { headers }));
+  const text = await resp.text();
+  let data = null;
+  try { data = text ? JSON.parse(text) : null; } catch (e) { data = null; }
+  if (!resp.ok) {
+    const msg = (data && data.detail) ? data.detail : text || (resp.status + "");
+    throw new Error(msg);
+  }
+  return data;
+}
+
+async function loadConfig(prefetched) {
+  try {
+    const data = prefetched ? _bootPart(prefetched) : await apiJson("/api/config");
+    document.getElementById("base_url").value = data.base_url || "";
+    document.getElementById("model").value = data.model || "";
+    document.getElementById("api_key").value = "";
+    const hint = document.getElementById("apiKeyHint");
+    if (hint) {
+      const configured = (data.api_key_configured !== undefined) ? !!data.api_key_configured : !!(data.api_key && data.api_key !== "***");
+      hint.textContent = configured ? ("当前 Key: " + (data.api_key || "***")) : "当前 Key: 未配置";
+    }
+    const pathHint = document.getElementById("configPathHint");
+    if (pathHint) {
+      const p = data.config_path || "";
+      const exists = (data.config_exists !== undefined) ? (!!data.config_exists) : true;
+      pathHint.textContent = p ? ("配置文件: " + p + (exists ? "" : "（不存在）")) : "";
+    }
+    document.getElementById("max_steps").value = data.max_steps || "";
+    document.getElementById("device_id").value = data.device_id || "";
+    document.getElementById("lang").value = data.lang || "";
+    setMsg("configMsg", "配置已加载（API Key 已隐藏，修改时请重新填写）");
+  } catch (e) {
+    setMsg("configMsg", "加载失败: " + e.message);
+  }
+}
+
+async function saveConfig() {
+  const payload = {
+    base_url: document.getElementById("base_url").value.trim(),
+    model: document.getElementById("model").value.trim(),
+    api_key: document.getElementById("api_key").value.trim(),
+    max_steps: document.getElementById("max_steps").value.trim(),
+    device_id: document.getElementById("device_id").value.trim(),
+    lang: document.getElementById("lang").value.trim(),
+  };
+  try {
+    const data = await apiJson("/api/config", { method: "POST", body: JSON.stringify(payload) });
+    setMsg("configMsg", data.message || "已保存");
+    await loadConfig();
+  } catch (e) {
+    setMsg("configMsg", "保存失败: " + e.message);
+  }
+}
+
+function renderDevices(list, selected) {
+  const body = document.getElementById("devicesBody");
+  body.textContent = "";
+  const frag = document.createDocumentFragment();
+  for (const d of list) {
+    const tr = document.createElement("tr");
+
+    const tdSerial = document.createElement("td");
+    tdSerial.textContent = d.serial || "";
+    if (selected && d.serial === selected) {
+      tdSerial.appendChild(document.createTextNode(" "));
+      const pill = document.createElement("span");
+      pill.className = "pill";
+      pill.textContent = "selected";
+      tdSerial.appendChild(pill);
+    }
+    tr.appendChild(tdSerial);
+
+    const tdStatus = document.createElement("td");
+    tdStatus.textContent = d.status || "";
+    tr.appendChild(tdStatus);
+
+    const tdModel = document.createElement("td");
+    tdModel.textContent = d.model || "";
+    tr.appendChild(tdModel);
+
+    const tdOps = document.createElement("td");
+    const btnSelect = document.createElement("button");
+    btnSelect.textContent = "选用";
+    btnSelect.dataset.action = "selectDevice";
+    btnSelect.dataset.id = d.serial || "";
+    const btnDisconnect = document.createElement("button");
+    btnDisconnect.textContent = "断开";
+    btnDisconnect.dataset.action = "disconnectOne";
+    btnDisconnect.dataset.id = d.serial || "";
+    tdOps.appendChild(btnSelect);
+    tdOps.appendChild(document.createTextNode(" "));
+    tdOps.appendChild(btnDisconnect);
+    tr.appendChild(tdOps);
+
+    frag.appendChild(tr);
+  }
+  body.appendChild(frag);
+}
+
+async function loadDevices(prefetched) {
+  try {
+    const data = prefetched ? _bootPart(prefetched) : await apiJson("/api/adb/devices");
+    renderDevices(data.devices || [], data.selected_device || "");
+    setMsg("adbMsg", "设备已刷新");
+  } catch (e) {
+    setMsg("adbMsg", "刷新失败: " + e.message);
+  }
+}
+
+async function adbPair() {
+  const host = document.getElementById("pair_host").value.trim();
+  const code = document.getElementById("pair_code").value.trim();
+  try {
+    const data = await apiJson("/api/adb/pair", { method: "POST", body: JSON.stringify({ host, code }) });
+    setMsg("adbMsg", data.output || data.message || "完成");
+    await loadDevices();
+  } catch (e) {
+    setMsg("adbMsg", "配对失败: " + e.message);
+  }
+}
+
+async function adbConnect() {
+  const host = document.getElementById("connect_host").value.trim();
+  try {
+    const data = await apiJson("/api/adb/connect", { method: "POST", body: JSON.stringify({ host }) });
+    setMsg("adbMsg", data.output || data.message || "完成");
+    await loadDevices();
+  } catch (e) {
+    setMsg("adbMsg", "连接失败: " + e.message);
+  }
+}
+
+async function disconnectOne(serial) {
+  try {
+    const data = await apiJson("/api/adb/disconnect", { method: "POST", body: JSON.stringify({ target: serial }) });
+    setMsg("adbMsg", data.output || data.message || "完成");
+    await loadDevices();
+  } catch (e) {
+    setMsg("adbMsg", "断开失败: " + e.message);
+  }
+}
+
+async function adbDisconnectAll() {
+  try {
+    const data = await apiJson("/api/adb/disconnect", { method: "POST", body: JSON.stringify({ target: "" }) });
+    setMsg("adbMsg", data.output || data.message || "完成");
+    await loadDevices();
+  } catch (e) {
+    setMsg("adbMsg", "断开失败: " + e.message);
+  }
+}
+
+async function adbRestart() {
+  try {
+    const data = await apiJson("/api/adb/restart", { method: "POST" });
+    setMsg("adbMsg", data.output || data.message || "完成");
+    await loadDevices();
+  } catch (e) {
+    setMsg("adbMsg", "重启失败: " + e.message);
+  }
+}
+
+async function adbConnectWifi() {
+  try {
+    const data = await apiJson("/api/adb/connect_wifi", { method: "POST", body: JSON.stringify({ port: 5555 }) });
+    const addr = data.address ? (" | " + data.address) : "";
+    setMsg("adbMsg", (data.output || data.message || "完成") + addr);
+    await loadDevices();
+  } catch (e) {
+    setMsg("adbMsg", "USB→WiFi 失败: " + e.message);
+  }
+}
+
+function setScreenMsg(msg) {
+  setMsg("screenMsg", msg);
+}
+
+function stopScreenAuto() {
+  screenAuto = false;
+  if (screenTimer) {
+    clearTimeout(screenTimer);
+    screenTimer = 0;
+  }
+  screenFailCount = 0;
+  closeScreenWs();
+  const btn = document.getElementById("screenAutoBtn");
+  if (btn) btn.textContent = "自动刷新";
+}
+
+function toggleScreenAuto() {
+  screenAuto = !screenAuto;
+  const btn = document.getElementById("screenAutoBtn");
+  if (btn) btn.textContent = screenAuto ? "停止自动" : "自动刷新";
+  if (screenAuto) {
+    scheduleScreenAuto(0);
+  } else {
+    stopScreenAuto();
+  }
+}
+
+function _screenBackoffMs() {
+  const base = 1200;
+  const pow = Math.min(screenFailCount, 4);
+  return Math.min(15000, base * Math.pow(2, pow));
+}
+
+function scheduleScreenAuto(delayMs) {
+  if (!screenAuto) return;
+  if (screenTimer) {
+    clearTimeout(screenTimer);
+    screenTimer = 0;
+  }
+  const ms = Math.max(0, parseInt(delayMs || 0, 10));
+  screenTimer = setTimeout(async () => {
+    if (!screenAuto) return;
+    if (!hasToken()) {
+      stopScreenAuto();
+      return;
+    }
+    if (document.visibilityState === "hidden") {
+      scheduleScreenAuto(5000);
+      return;
+    }
+    const ok = await (screenWsBroken ? refreshScreenshot() : wsScreenshot());
+    scheduleScreenAuto(ok ? 1200 : _screenBackoffMs());
+  }, ms);
+}
+
+let screenEtag = "";
+let screenWs = null;
+let screenWsBroken = false;
+let screenWsWaiter = null;
+let screenWsMeta = null;
+
+async function decodeScreenBlob(blob) {
+  if (typeof createImageBitmap === "function") return createImageBitmap(blob);
+  const url = URL.createObjectURL(blob);
+  try {
+    const img = new Image();
+    img.src = url;
+    await img.decode();
+    return img;
+  } finally {
+    URL.revokeObjectURL(url);
+  }
+}
+
+async function showScreenBlob(blob) {
+  // createImageBitmap 在主线程外解码 PNG，绘制放到下一帧，自动刷新时页面不卡顿
+  const bmp = await decodeScreenBlob(blob);
+  requestAnimationFrame(() => {
+    const c = SCREEN_CANVAS;
+    if (c) {
+      if (c.width !== bmp.width) c.width = bmp.width;
+      if (c.height !== bmp.height) c.height = bmp.height;
+      c.getContext("2d").drawImage(bmp, 0, 0);
+      screenDrawn = true;
+    }
+    if (bmp.close) bmp.close();
+  });
+}
+
+function applyScreenMeta(width, height, deviceId) {
+  const c = SCREEN_CANVAS;
+  screenMeta = {
+    width: width || (c && c.width) || 0,
+    height: height || (c && c.height) || 0,
+    device_id: deviceId || "",
+  };
+  const sizeText = (screenMeta.width && screenMeta.height) ? (screenMeta.width + "x" + screenMeta.height) : "unknown";
+  setScreenMsg("设备: " + (screenMeta.device_id || "(自动)") + " | 分辨率: " + sizeText);
+}
+
+async function refreshScreenshot() {
+  // 后台标签页不拉取也不解码截图（点击后的延迟刷新可能在切走后才触发）；回到前台由 visibilitychange 恢复
+  if (document.hidden) return true;
+  try {
+    // 直接拉取 PNG 字节；<img src> 无法带 Authorization 头，所以用 fetch + Blob URL
+    const headers = authHeader();
+    if (screenEtag) headers["If-None-Match"] = screenEtag;
+    const resp = await fetch("/api/screen/screenshot.png", { headers, cache: "no-store" });
+    if (!resp.ok && resp.status !== 304) {
+      const text = await resp.text();
+      let data = null;
+      try { data = text ? JSON.parse(text) : null; } catch (e) { data = null; }
+      throw new Error((data && data.detail) ? data.detail : text || (resp.status + ""));
+    }
+    if (resp.status !== 304) {
+      await showScreenBlob(await resp.blob());
+      screenEtag = resp.headers.get("ETag") || "";
+    }
+    applyScreenMeta(
+      parseInt(resp.headers.get("X-Screen-Width") || "", 10),
+      parseInt(resp.headers.get("X-Screen-Height") || "", 10),
+      resp.headers.get("X-Screen-Device") || "",
+    );
+    screenFailCount = 0;
+    return true;
+  } catch (e) {
+    setScreenMsg("截图失败: " + e.message);
+    screenFailCount += 1;
+    return false;
+  }
+}
+
+function _settleScreenWs(err) {
+  const w = screenWsWaiter;
+  screenWsWaiter = null;
+  if (!w) return;
+  if (err) w.reject(err); else w.resolve();
+}
+
+function onScreenWsMessage(ev) {
+  if (typeof ev.data === "string") {
+    let msg = null;
+    try { msg = JSON.parse(ev.data); } catch (e) { msg = null; }
+    if (!msg) return;
+    if (msg.error) {
+      _settleScreenWs(new Error(msg.error));
+    } else if (msg.unchanged) {
+      applyScreenMeta(msg.width, msg.height, msg.device_id);
+      _settleScreenWs(null);
+    } else {
+      screenWsMeta = msg;
+    }
+    return;
+  }
+  const m = screenWsMeta || {};
+  screenWsMeta = null;
+  showScreenBlob(ev.data).then(() => {
+    applyScreenMeta(m.width, m.height, m.device_id);
+    _settleScreenWs(null);
+  }, (e) => _settleScreenWs(e));
+}
+
+function openScreenWs() {
+  return new Promise((resolve) => {
+    const proto = location.protocol === "https:" ? "wss://" : "ws://";
+    let ws = null;
+    let opened = false;
+    try { ws = new WebSocket(proto + location.host + "/ws/screen"); } catch (e) { screenWsBroken = true; resolve(null); return; }
+    ws.binaryType = "blob";
+    ws.onopen = () => {
+      opened = true;
+      ws.send(JSON.stringify({ token: localStorage.getItem(LS_TOKEN_KEY) || "" }));
+      resolve(ws);
+    };
+    ws.onmessage = onScreenWsMessage;
+    ws.onclose = (ev) => {
+      if (screenWs === ws) screenWs = null;
+      // 握手都没成功（如服务端未安装 websockets），后续回退到 HTTP 轮询
+      if (!opened) { screenWsBroken = true; resolve(null); return; }
+      _settleScreenWs(new Error(ev.code === 4403 ? "Token 无效" : ("连接已断开" + (ev.reason ? ": " + ev.reason : ""))));
+    };
+  });
+}
+
+function closeScreenWs() {
+  if (screenWs) {
+    try { screenWs.close(); } catch (e) { }
+    screenWs = null;
+  }
+}
+
+async function wsScreenshot() {
+  // 一条 WebSocket 连接只鉴权一次；每发送一次 "next" 收一帧，节奏仍由 scheduleScreenAuto 控制
+  try {
+    if (!screenWs) screenWs = await openScreenWs();
+    if (!screenWs) return refreshScreenshot();
+    const ws = screenWs;
+    await new Promise((resolve, reject) => {
+      screenWsWaiter = { resolve, reject };
+      ws.send("next");
+    });
+    screenFailCount = 0;
+    return true;
+  } catch (e) {
+    setScreenMsg("截图失败: " + e.message);
+    screenFailCount += 1;
+    return false;
+  }
+}
+
+function addRipple(x, y) {
+  const wrap = document.getElementById("screenWrap");
+  if (!wrap) return;
+  const el = document.createElement("div");
+  el.className = "ripple-circle";
+  el.style.left = x + "px";
+  el.style.top = y + "px";
+  wrap.appendChild(el);
+  setTimeout(() => {
+    try { wrap.removeChild(el); } catch (e) { }
+  }, 600);
+}
+
+function debounce(fn, ms) {
+  let h = 0;
+  return (...args) => {
+    clearTimeout(h);
+    h = setTimeout(() => fn(...args), ms);
+  };
+}
+
+const refreshAfterTap = debounce(() => {
+  if (hasToken()) refreshScreenshot();
+}, 300);
+
+let pendingTaps = [];
+let tapFlushTimer = 0;
+const TAP_BATCH_MS = 50;
+
+function onScreenClick(ev) {
+  if (!hasToken()) return;
+  const c = SCREEN_CANVAS;
+  if (!c || !screenDrawn) return;
+  const rect = c.getBoundingClientRect();
+  if (!rect.width || !rect.height) return;
+  const relX = (ev.clientX - rect.left) / rect.width;
+  const relY = (ev.clientY - rect.top) / rect.height;
+  const w = screenMeta.width || c.width || 0;
+  const h = screenMeta.height || c.height || 0;
+  if (!w || !h) return;
+  const x = Math.max(0, Math.min(w - 1, Math.round(relX * w)));
+  const y = Math.max(0, Math.min(h - 1, Math.round(relY * h)));
+  addRipple(ev.clientX - rect.left, ev.clientY - rect.top);
+  // 50ms 内的连续点击合并为一次请求（设备端一次 adb shell 依次执行）
+  pendingTaps.push([x, y]);
+  if (!tapFlushTimer) tapFlushTimer = setTimeout(flushTaps, TAP_BATCH_MS);
+}
+
+async function flushTaps(keepalive) {
+  if (tapFlushTimer) {
+    clearTimeout(tapFlushTimer);
+    tapFlushTimer = 0;
+  }
+  if (!pendingTaps.length) return;
+  if (screenTapInflight && !keepalive) {
+    // 上一批还在执行：稍后再发，保证点击顺序
+    tapFlushTimer = setTimeout(flushTaps, TAP_BATCH_MS);
+    return;
+  }
+  const taps = pendingTaps.splice(0, 50);
+  try {
+    screenTapInflight = true;
+    const payload = { taps, device_id: (screenMeta.device_id || "") };
+    const resp = await apiJson("/api/control/tap_batch", { method: "POST", body: JSON.stringify(payload), keepalive: !!keepalive });
+    const last = taps[taps.length - 1];
+    const extra = (resp && resp.output) ? (" | " + resp.output) : "";
+    setScreenMsg("已发送 tap: (" + last[0] + "," + last[1] + ")" + (taps.length > 1 ? (" 等 " + taps.length + " 次") : "") + extra);
+    // 截图是静态的；发送 tap 后稍后刷新一帧，避免用户误以为没生效（连续点击只刷新最后一次）
+    refreshAfterTap();
+  } catch (e) {
+    setScreenMsg("tap 失败: " + e.message);
+  } finally {
+    screenTapInflight = false;
+  }
+  if (pendingTaps.length && !tapFlushTimer) tapFlushTimer = setTimeout(flushTaps, TAP_BATCH_MS);
+}
+
+async function selectDevice(serial) {
+  try {
+    const data = await apiJson("/api/config/device", { method: "POST", body: JSON.stringify({ device_id: serial }) });
+    setMsg("adbMsg", data.message || "已设置");
+    await loadDevices();
+  } catch (e) {
+    setMsg("adbMsg", "设置失败: " + e.message);
+  }
+}
+
+// 任务
+function renderTasks(list) {
+  tasksCache = list || [];
+  tasksById = new Map(tasksCache.map(t => [t.id, t]));
+  const body = document.getElementById("tasksBody");
+  body.textContent = "";
+  const sel = document.getElementById("sched_task");
+  if (sel) {
+    sel.textContent = "";
+    const selFrag = document.createDocumentFragment();
+    for (const t of tasksCache) {
+      const opt = document.createElement("option");
+      opt.value = t.id || "";
+      opt.textContent = (t.name || t.id || "");
+      selFrag.appendChild(opt);
+    }
+    sel.appendChild(selFrag);
+  }
+  // 行先放进 DocumentFragment，循环结束后一次性挂到表格上，只触发一次重排
+  const frag = document.createDocumentFragment();
+  for (const t of tasksCache) {
+    const tr = document.createElement("tr");
+
+    const tdId = document.createElement("td");
+    tdId.textContent = t.id || "";
+    tr.appendChild(tdId);
+
+    const tdName = document.createElement("td");
+    tdName.textContent = t.name || "";
+    tr.appendChild(tdName);
+
+    const tdOps = document.createElement("td");
+    const btnRun = document.createElement("button");
+    btnRun.textContent = "运行";
+    btnRun.dataset.action = "runTask";
+    btnRun.dataset.id = t.id || "";
+    const btnEdit = document.createElement("button");
+    btnEdit.textContent = "编辑";
+    btnEdit.dataset.action = "editTask";
+    btnEdit.dataset.id = t.id || "";
+    const btnDelete = document.createElement("button");
+    btnDelete.textContent = "删除";
+    btnDelete.dataset.action = "deleteTask";
+    btnDelete.dataset.id = t.id || "";
+    tdOps.appendChild(btnRun);
+    tdOps.appendChild(document.createTextNode(" "));
+    tdOps.appendChild(btnEdit);
+    tdOps.appendChild(document.createTextNode(" "));
+    tdOps.appendChild(btnDelete);
+    tr.appendChild(tdOps);
+
+    frag.appendChild(tr);
+  }
+  body.appendChild(frag);
+}
+
+async function loadTasks(prefetched) {
+  try {
+    const data = prefetched ? _bootPart(prefetched) : await apiJson("/api/tasks");
+    renderTasks(data.tasks || []);
+    setMsg("taskMsg", "任务列表已刷新");
+  } catch (e) {
+    setMsg("taskMsg", "刷新失败: " + e.message);
+  }
+}
+
+function resetTaskForm() {
+  document.getElementById("task_id").value = "";
+  document.getElementById("task_name").value = "";
+  document.getElementById("task_desc").value = "";
+  document.getElementById("task_prompt").value = "";
+  document.getElementById("task_steps").value = "";
+  document.getElementById("task_parallel").checked = false;
+  const out = document.getElementById("taskRunOutput");
+  if (out) out.textContent = "";
+}
+
+// 步骤 JSON 在输入时（防抖 250ms）解析并缓存；保存时原文未变则直接复用解析结果
+let stepsParsed = { raw: "[]", value: [], error: "" };
+let stepsErrorShown = false;
+
+function parseTaskSteps() {
+  const raw = document.getElementById("task_steps").value.trim() || "[]";
+  if (raw !== stepsParsed.raw) {
+    try {
+      stepsParsed = { raw, value: JSON.parse(raw), error: "" };
+    } catch (e) {
+      stepsParsed = { raw, value: null, error: e.message };
+    }
+  }
+  return stepsParsed;
+}
+
+const checkTaskSteps = debounce(() => {
+  const st = parseTaskSteps();
+  if (st.error) {
+    setMsg("taskMsg", "步骤 JSON 解析失败: " + st.error);
+    stepsErrorShown = true;
+  } else if (stepsErrorShown) {
+    setMsg("taskMsg", "");
+    stepsErrorShown = false;
+  }
+}, 250);
+
+function initTaskStepsCheck() {
+  const input = document.getElementById("task_steps");
+  if (input) input.addEventListener("input", checkTaskSteps);
+}
+
+async function saveTask() {
+  const st = parseTaskSteps();
+  if (st.error) {
+    setMsg("taskMsg", "步骤 JSON 解析失败: " + st.error);
+    return;
+  }
+  const steps = st.value;
+  const payload = {
+    id: document.getElementById("task_id").value.trim(),
+    name: document.getElementById("task_name").value.trim(),
+    description: document.getElementById("task_desc").value.trim(),
+    prompt: document.getElementById("task_prompt").value.trim(),
+    steps,
+    parallel: document.getElementById("task_parallel").checked,
+  };
+  try {
+    const data = await apiJson("/api/tasks", { method: "POST", body: JSON.stringify(payload) });
+    setMsg("taskMsg", data.message || "已保存");
+    await loadTasks();
+    if (!payload.id) resetTaskForm();
+  } catch (e) {
+    setMsg("taskMsg", "保存失败: " + e.message);
+  }
+}
+
+function editTask(id) {
+  const t = tasksById.get(id);
+  if (!t) return;
+  document.getElementById("task_id").value = t.id;
+  document.getElementById("task_name").value = t.name || "";
+  document.getElementById("task_desc").value = t.description || "";
+  document.getElementById("task_prompt").value = t.prompt || "";
+  document.getElementById("task_steps").value = JSON.stringify(t.steps || [], null, 2);
+  document.getElementById("task_parallel").checked = !!t.parallel;
+}
+
+// 调度
+  let schedPreviewTimer = 0;
+
+  function setSchedulePreview(text) {
+    const el = document.getElementById("schedPreview");
+    if (el) el.textContent = text || "";
+  }
+
+  function formatShanghaiTs(ts) {
+    return new Date(ts * 1000).toLocaleString("zh-CN", { timeZone: "Asia/Shanghai" });
+  }
+
+  async function previewCron(cron) {
+    try {
+      const data = await apiJson(`/api/schedules/preview?cron=${encodeURIComponent(cron)}`);
+      if (data && data.ok && data.next_run_ts) {
+        setSchedulePreview("\u4e0b\u6b21\u6267\u884c\uff1a" + formatShanghaiTs(data.next_run_ts));
+        return;
+      }
+      const msg = (data && data.message) ? data.message : "\u65e0\u6cd5\u9884\u89c8";
+      setSchedulePreview(msg);
+    } catch (e) {
+      setSchedulePreview("\u9884\u89c8\u5931\u8d25: " + e.message);
+    }
+  }
+
+  function schedulePreviewCron() {
+    const cron = document.getElementById("sched_cron").value.trim();
+    if (!cron) {
+      setSchedulePreview("");
+      return;
+    }
+    if (schedPreviewTimer) clearTimeout(schedPreviewTimer);
+    schedPreviewTimer = setTimeout(() => previewCron(cron), 400);
+  }
+
+  function initSchedulePreview() {
+    const input = document.getElementById("sched_cron");
+    if (!input) return;
+    input.addEventListener("input", () => schedulePreviewCron());
+    input.addEventListener("change", () => schedulePreviewCron());
+  }
+
+  function resetScheduleForm() {
+    document.getElementById("sched_id").value = "";
+    document.getElementById("sched_cron").value = "";
+    document.getElementById("sched_enabled").checked = true;
+    setMsg("schedMsg", "");
+    setSchedulePreview("");
+  }
+
+  function fillSchedule(id) {
+    const s = schedulesById.get(id);
+    if (!s) return;
+    document.getElementById("sched_id").value = s.id || "";
+    document.getElementById("sched_cron").value = s.cron || "";
+    document.getElementById("sched_enabled").checked = !!s.enabled;
+    document.getElementById("sched_task").value = s.task_id || "";
+    schedulePreviewCron();
+  }
+
+function renderSchedules(list) {
+  schedulesById = new Map((list || []).map(s => [s.id, s]));
+  const body = document.getElementById("schedBody");
+  body.textContent = "";
+  const frag = document.createDocumentFragment();
+  for (const s of list || []) {
+    const tr = document.createElement("tr");
+    const tdId = document.createElement("td");
+    tdId.textContent = s.id || "";
+    tr.appendChild(tdId);
+    const tdTask = document.createElement("td");
+    const task = tasksById.get(s.task_id);
+    tdTask.textContent = task ? (task.name || task.id) : (s.task_id || "");
+    tr.appendChild(tdTask);
+    const tdCron = document.createElement("td");
+    tdCron.textContent = s.cron || "";
+    tr.appendChild(tdCron);
+    const tdEnabled = document.createElement("td");
+    const lastHist = (s.history || []).slice(-1)[0];
+    const lastResult = lastHist ? ((lastHist.ok ? "OK" : "FAIL") + (lastHist.output ? (": " + lastHist.output) : "")) : "";
+    tdEnabled.textContent = s.enabled ? "启用" : "停用";
+    if (lastResult) tdEnabled.title = lastResult;
+    tr.appendChild(tdEnabled);
+    const tdLast = document.createElement("td");
+    const lastTs = parseInt(s.last_run_ts || 0, 10);
+    tdLast.textContent = lastTs ? new Date(lastTs * 1000).toLocaleString("zh-CN", { timeZone: "Asia/Shanghai" }) : "-";
+    tr.appendChild(tdLast);
+    const tdOps = document.createElement("td");
+    const btnFill = document.createElement("button");
+    btnFill.textContent = "填入表单";
+    btnFill.dataset.action = "fillSchedule";
+    btnFill.dataset.id = s.id || "";
+    const btnDel = document.createElement("button");
+    btnDel.textContent = "删除";
+    btnDel.dataset.action = "deleteSchedule";
+    btnDel.dataset.id = s.id || "";
+    tdOps.appendChild(btnFill);
+    tdOps.appendChild(document.createTextNode(" "));
+    tdOps.appendChild(btnDel);
+    tr.appendChild(tdOps);
+    frag.appendChild(tr);
+  }
+  body.appendChild(frag);
+}
+
+async function loadSchedules(prefetched) {
+  try {
+    const data = prefetched ? _bootPart(prefetched) : await apiJson("/api/schedules");
+    renderSchedules(data.schedules || []);
+    setMsg("schedMsg", "调度已刷新");
+  } catch (e) {
+    setMsg("schedMsg", "刷新失败: " + e.message);
+  }
+}
+
+async function saveSchedule() {
+  const schedId = document.getElementById("sched_id").value.trim();
+  const taskId = document.getElementById("sched_task").value.trim();
+  const cron = document.getElementById("sched_cron").value.trim();
+  const enabled = document.getElementById("sched_enabled").checked;
+  if (!taskId) {
+    setMsg("schedMsg", "请选择任务");
+    return;
+  }
+  if (!cron) {
+    setMsg("schedMsg", "请填写 cron 表达式");
+    return;
+  }
+  try {
+    const payload = { id: schedId, task_id: taskId, cron, enabled };
+    const data = await apiJson("/api/schedules", { method: "POST", body: JSON.stringify(payload) });
+    setMsg("schedMsg", data.message || "已保存");
+    await loadSchedules();
+  } catch (e) {
+    setMsg("schedMsg", "保存失败: " + e.message);
+  }
+}
+
+async function deleteSchedule(id) {
+  if (!id) return;
+  if (!confirm("删除该调度？")) return;
+  try {
+    await apiJson(`/api/schedules/${id}`, { method: "DELETE" });
+    setMsg("schedMsg", "已删除");
+    await loadSchedules();
+  } catch (e) {
+    setMsg("schedMsg", "删除失败: " + e.message);
+  }
+}
+
+async function deleteTask(id) {
+  if (!confirm("删除该任务？")) return;
+  try {
+    await apiJson(`/api/tasks/${id}`, { method: "DELETE" });
+    setMsg("taskMsg", "已删除");
+    await loadTasks();
+  } catch (e) {
+    setMsg("taskMsg", "删除失败: " + e.message);
+  }
+}
+
+function _clipText(s, maxLen) {
+  const t = (s || "").toString();
+  const n = Math.max(200, parseInt(maxLen || 800, 10));
+  return t.length > n ? (t.slice(0, n) + "...(truncated)") : t;
+}
+
+function _formatRunResult(r) {
+  const ok = !!r.ok;
+  const t = (r.type || "step").toString();
+  const o = _clipText(r.output || "", 1200);
+  return (ok ? "[OK] " : "[FAIL] ") + t + (o ? (": " + o) : "");
+}
+
+async function runTask(id) {
+  // 以 SSE 方式接收结果：每完成一步追加一条，长任务也能看到进度
+  try {
+    setMsg("taskMsg", "执行中…");
+    const out = document.getElementById("taskRunOutput");
+    if (out) out.textContent = "";
+    const headers = Object.assign({ "Content-Type": "application/json", "Accept": "text/event-stream" }, authHeader());
+    const resp = await fetch(`/api/tasks/${id}/run`, { method: "POST", headers, body: JSON.stringify({}) });
+    if (!resp.ok || !resp.body) {
+      const text = await resp.text();
+      let data = null;
+      try { data = text ? JSON.parse(text) : null; } catch (e) { data = null; }
+      throw new Error((data && data.detail) ? data.detail : text || (resp.status + ""));
+    }
+    const lines = [];
+    let anyFail = false;
+    let streamError = "";
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      let idx;
+      while ((idx = buf.indexOf("\n\n")) >= 0) {
+        const frame = buf.slice(0, idx);
+        buf = buf.slice(idx + 2);
+        for (const line of frame.split("\n")) {
+          if (!line.startsWith("data: ")) continue;
+          const msg = JSON.parse(line.slice(6));
+          if (msg.result) {
+            if (!msg.result.ok) anyFail = true;
+            lines.push(_formatRunResult(msg.result));
+            if (out) out.textContent = lines.join("\n\n");
+          } else if (msg.error) {
+            streamError = msg.error;
+          }
+        }
+      }
+    }
+    if (out && !lines.length) out.textContent = "(无输出)";
+    if (streamError) throw new Error(streamError);
+    setMsg("taskMsg", anyFail ? "执行结束（存在失败步骤）" : "执行完成");
+  } catch (e) {
+    setMsg("taskMsg", "执行失败: " + e.message);
+  }
+}
+
+// 交互模式
+async function startSession() {
+  try {
+    const data = await apiJson("/api/interactive/start", { method: "POST" });
+    sessionId = data.session_id;
+    document.getElementById("sessionLabel").textContent = "会话: " + sessionId;
+    setMsg("sessionMsg", "会话已创建");
+    document.getElementById("sessionLog").textContent = "";
+  } catch (e) {
+    setMsg("sessionMsg", "创建失败: " + e.message);
+  }
+}
+
+async function sendSession() {
+  const text = document.getElementById("session_input").value.trim();
+  if (!sessionId) {
+    setMsg("sessionMsg", "请先创建会话");
+    return;
+  }
+  if (!text) return;
+  try {
+    const data = await apiJson(`/api/interactive/${sessionId}/send`, { method: "POST", body: JSON.stringify({ text }) });
+    document.getElementById("sessionLog").textContent = (data.logs || []).join("\n");
+    document.getElementById("session_input").value = "";
+  } catch (e) {
+    setMsg("sessionMsg", "发送失败: " + e.message);
+  }
+}
+
+// 已安装包名
+const LS_PKG_KEY = "autoglm_web_packages";
+
+function _loadPkgCache() {
+  try {
+    const c = JSON.parse(localStorage.getItem(LS_PKG_KEY) || "null");
+    return (c && c.etag && Array.isArray(c.packages)) ? c : null;
+  } catch (e) {
+    return null;
+  }
+}
+
+async function fetchPackages() {
+  // 带上次的 ETag 请求；列表未变化时服务端回 304，直接复用本地缓存，且不重建 <option>
+  try {
+    const cached = _loadPkgCache();
+    const headers = authHeader();
+    if (cached) headers["If-None-Match"] = cached.etag;
+    const resp = await fetch("/api/adb/packages", { headers, cache: "no-store" });
+    let pkgs = [];
+    if (resp.status === 304 && cached) {
+      pkgs = cached.packages;
+      if (packagesCache !== pkgs && !(packagesCache.length === pkgs.length && packagesCache.every((p, i) => p === pkgs[i]))) {
+        renderPackages(pkgs);
+      }
+    } else {
+      const text = await resp.text();
+      let data = null;
+      try { data = text ? JSON.parse(text) : null; } catch (e) { data = null; }
+      if (!resp.ok) throw new Error((data && data.detail) ? data.detail : text || (resp.status + ""));
+      pkgs = (data && data.packages) || [];
+      renderPackages(pkgs);
+      const etag = resp.headers.get("ETag") || "";
+      try {
+        if (etag) localStorage.setItem(LS_PKG_KEY, JSON.stringify({ etag, packages: pkgs }));
+      } catch (e) { }
+    }
+    setMsg("pkgMsg", "已获取 " + pkgs.length + " 个包名");
+  } catch (e) {
+    setMsg("pkgMsg", "获取失败: " + e.message);
+  }
+}
+
+async function addToAppsConfig() {
+  const pkg = (document.getElementById("pkg_select").value || "").trim();
+  if (!pkg) {
+    setMsg("pkgMsg", "请先获取并选择包名");
+    return;
+  }
+  const nameInput = document.getElementById("pkg_name").value.trim() || pkg;
+  const payload = { items: [{ name: nameInput, package: pkg }] };
+  try {
+    const data = await apiJson("/api/adb/packages/add", { method: "POST", body: JSON.stringify(payload) });
+    setMsg("pkgMsg", data.message || "已写入 apps.py");
+  } catch (e) {
+    setMsg("pkgMsg", "写入失败: " + e.message);
+  }
+}
+
+function renderPackages(list) {
+  packagesCache = Array.isArray(list) ? list : [];
+  const sel = document.getElementById("pkg_select");
+  if (!sel) return;
+  sel.textContent = "";
+  const frag = document.createDocumentFragment();
+  for (const pkg of packagesCache) {
+    const p = (pkg || "").toString();
+    if (!p) continue;
+    const opt = document.createElement("option");
+    opt.value = p;
+    opt.textContent = p;
+    frag.appendChild(opt);
+  }
+  sel.appendChild(frag);
+}
+
+async function loadSessionLog() {
+  if (!sessionId) return;
+  try {
+    const data = await apiJson(`/api/interactive/${sessionId}/log`);
+    document.getElementById("sessionLog").textContent = (data.logs || []).join("\n");
+  } catch (e) {
+    setMsg("sessionMsg", "获取日志失败: " + e.message);
+  }
+}
+
+async function autoglmStart() {
+  try {
+    const data = await apiJson("/api/autoglm/start", { method: "POST" });
+    setMsg("runMsg", data.message || "已启动");
+    await autoglmStatus();
+  } catch (e) {
+    setMsg("runMsg", "启动失败: " + e.message);
+  }
+}
+
+async function autoglmStop() {
+  try {
+    const data = await apiJson("/api/autoglm/stop", { method: "POST" });
+    setMsg("runMsg", data.message || "已停止");
+    await autoglmStatus();
+  } catch (e) {
+    setMsg("runMsg", "停止失败: " + e.message);
+  }
+}
+
+async function autoglmStatus(prefetched) {
+  try {
+    const data = prefetched ? _bootPart(prefetched) : await apiJson("/api/autoglm/status");
+    document.getElementById("runPill").textContent = data.running ? ("running pid=" + data.pid) : "stopped";
+  } catch (e) {
+    document.getElementById("runPill").textContent = "unknown";
+    setMsg("runMsg", "状态获取失败: " + e.message);
+  }
+}
+
+// 日志区最多保留的字符数；超出后裁到 LOG_VIEW_KEEP，避免长时间运行后 DOM 越积越大
+const LOG_VIEW_MAX = 200000;
+const LOG_VIEW_KEEP = 150000;
+let logChars = 0;
+
+function clearLogView() {
+  document.getElementById("logBox").textContent = "";
+  logChars = 0;
+}
+
+function toggleFollow() {
+  follow = !follow;
+  document.getElementById("followBtn").textContent = follow ? "暂停滚动" : "恢复滚动";
+}
+
+function appendLog(data) {
+  if (data && data.text) {
+    const box = document.getElementById("logBox");
+    // 追加文本节点而不是 textContent +=，避免每次重建整段日志文本
+    box.appendChild(document.createTextNode(data.text));
+    logChars += data.text.length;
+    if (logChars > LOG_VIEW_MAX) {
+      box.textContent = box.textContent.slice(-LOG_VIEW_KEEP);
+      logChars = LOG_VIEW_KEEP;
+    }
+    if (follow) box.scrollTop = box.scrollHeight;
+  }
+  if (data && data.offset !== undefined) logOffset = data.offset;
+}
+
+let logStreamAbort = null;
+let logStreamTimer = 0;
+let logRetryMs = 1000;
+
+function scheduleLogStream(ms) {
+  if (logStreamTimer) clearTimeout(logStreamTimer);
+  logStreamTimer = setTimeout(streamLogs, ms);
+}
+
+async function streamLogs() {
+  // 通过 SSE 长连接接收日志增量；断开后从 logOffset 续传，连续失败时重连间隔从 1 秒逐步退避到 5 秒。
+  // 页面在后台时不保持连接，回到前台由 visibilitychange 重新连接
+  logStreamTimer = 0;
+  if (logStreamAbort || document.hidden) return;
+  const ctrl = new AbortController();
+  logStreamAbort = ctrl;
+  try {
+    if (!hasToken()) throw new Error("no token");
+    const resp = await fetch("/api/logs/stream?offset=" + logOffset, { headers: authHeader(), signal: ctrl.signal });
+    if (!resp.ok || !resp.body) throw new Error(resp.status + "");
+    logRetryMs = 1000;
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      let idx;
+      while ((idx = buf.indexOf("\n\n")) >= 0) {
+        const frame = buf.slice(0, idx);
+        buf = buf.slice(idx + 2);
+        for (const line of frame.split("\n")) {
+          if (line.startsWith("data: ")) appendLog(JSON.parse(line.slice(6)));
+        }
+      }
+    }
+  } catch (e) {
+    // token 未填/服务未启动/切到后台主动断开时会报错，忽略即可
+    logRetryMs = Math.min(logRetryMs * 1.5, 5000);
+  } finally {
+    logStreamAbort = null;
+  }
+  if (!document.hidden) scheduleLogStream(logRetryMs);
+}
+
+async function loadChecks(prefetched) {
+  try {
+    const data = prefetched ? _bootPart(prefetched) : await apiJson("/api/checks");
+    const items = [];
+    if (data.adb && !data.adb.ok) items.push("ADB: " + (data.adb.message || "异常"));
+    if (data.autoglm_dir && !data.autoglm_dir.ok) items.push("Open-AutoGLM: " + (data.autoglm_dir.message || "异常"));
+    if (data.config && !data.config.ok) items.push("配置: " + (data.config.message || "异常"));
+    if (data.device && !data.device.ok) items.push("设备: " + (data.device.message || "异常"));
+    setMsg("checkMsg", items.length ? ("自检: " + items.join(" | ")) : "自检: OK");
+  } catch (e) {
+    // 没有 Token 时会报错，忽略即可
+    setMsg("checkMsg", "");
+  }
+}
+
+function _bootPart(part) {
+  // /api/bootstrap 中的单个部分：{ok: true, data} 或 {ok: false, error}
+  if (part && part.ok) return part.data || {};
+  throw new Error((part && part.error) || "unknown");
+}
+
+async function refreshAll() {
+  if (!hasToken()) {
+    setMsg("checkMsg", "请先粘贴并保存 Token");
+    setMsg("configMsg", "");
+    setMsg("apiKeyHint", "");
+    setMsg("configPathHint", "");
+    setMsg("adbMsg", "");
+    setMsg("taskMsg", "");
+    setMsg("runMsg", "");
+    setScreenMsg("");
+    stopScreenAuto();
+    return;
+  }
+  // 一次请求拿到全部面板数据，再分发给各面板；接口不可用时回退为逐个请求
+  let boot = null;
+  try {
+    boot = await apiJson("/api/bootstrap");
+  } catch (e) {
+    boot = null;
+  }
+  if (boot) {
+    await loadChecks(boot.checks || {});
+    await loadConfig(boot.config || {});
+    await loadDevices(boot.devices || {});
+    // 调度表格需要任务名，先渲染任务
+    await loadTasks(boot.tasks || {});
+    await loadSchedules(boot.schedules || {});
+    await autoglmStatus(boot.autoglm || {});
+  } else {
+    await loadChecks();
+    await loadConfig();
+    await loadDevices();
+    await loadTasks();
+    await loadSchedules();
+    await autoglmStatus();
+  }
+  await refreshScreenshot();
+}
+
+async function loadServerInfo() {
+  const r = await fetch("/api/info");
+  const j = await r.json();
+  let text = "监听 " + j.host + ":" + j.port;
+  if (j.urls && j.urls.length) {
+    text += " | 访问: " + j.urls.join("  ");
+  }
+  document.getElementById("serverInfo").textContent = text;
+}
+
+// 页面按钮通过 data-action 声明要调用的函数，由 document 上的单个 click 监听统一分发
+const ACTIONS = {
+  refreshAll,
+  saveToken,
+  clearToken,
+  saveConfig,
+  loadConfig,
+  adbPair,
+  adbConnect,
+  adbConnectWifi,
+  adbDisconnectAll,
+  adbRestart,
+  loadDevices,
+  fetchPackages,
+  addToAppsConfig,
+  refreshScreenshot,
+  toggleScreenAuto,
+  saveTask,
+  resetTaskForm,
+  loadSchedules,
+  saveSchedule,
+  resetScheduleForm,
+  loadTasks,
+  autoglmStart,
+  autoglmStop,
+  autoglmStatus,
+  clearLogView,
+  toggleFollow,
+  startSession,
+  sendSession,
+  loadSessionLog,
+};
+
+const ROW_ACTIONS = {
+  selectDevice,
+  disconnectOne,
+  runTask,
+  editTask,
+  deleteTask,
+  fillSchedule,
+  deleteSchedule,
+};
+
+document.addEventListener("click", (ev) => {
+  const el = ev.target.closest("[data-action]");
+  if (!el) return;
+  if (el.dataset.action === "showTab") {
+    showTab(el.dataset.tab);
+    return;
+  }
+  // 表格行内按钮带 data-id，交给 ROW_ACTIONS 并传入该 id；渲染时不再为每行创建闭包
+  if (el.dataset.id !== undefined) {
+    const rowFn = ROW_ACTIONS[el.dataset.action];
+    if (rowFn) rowFn(el.dataset.id);
+    return;
+  }
+  // 其余处理函数一律不带参数调用（部分 loadXxx 的可选参数仅供 refreshAll 传入预取数据）
+  const fn = ACTIONS[el.dataset.action];
+  if (fn) fn();
+});
+
+document.getElementById("token").value = localStorage.getItem(LS_TOKEN_KEY) || "";
+if (SCREEN_CANVAS) SCREEN_CANVAS.addEventListener("click", onScreenClick);
+  initTabs();
+  initSchedulePreview();
+  initTaskStepsCheck();
+document.addEventListener("visibilitychange", () => {
+  // 页面切到后台时立即发出尚未合并发送的点击（keepalive 保证页面卸载时请求仍能完成）
+  if (document.visibilityState === "hidden") {
+    flushTaps(true);
+    if (logStreamAbort) logStreamAbort.abort();
+  } else if (!logStreamAbort) {
+    scheduleLogStream(0);
+  }
+  if (!screenAuto) return;
+  if (document.visibilityState === "visible") {
+    scheduleScreenAuto(0);
+  }
+});
+loadServerInfo();
+refreshAll();
+streamLogs();
@@ -32,41 +32,97 @@ def _load_json(path: Path) -> list[dict[str, Any]]:
 def _dump_json(path: Path, data: list[dict[str, Any]]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp = path.with_suffix(".tmp")
-    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    # 直接编码写入文件，不在内存中先拼出完整 JSON 字符串
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
     tmp.replace(path)
 
 
+# 已解析的 tasks.json 及按 id 的索引，按 (路径, mtime_ns, size) 失效；只在持有 _lock 时读写
+_tasks_cache: tuple[tuple[str, int, int], list[dict[str, Any]], dict[str, dict[str, Any]]] | None = None
+
+
+def _file_key(path: Path) -> tuple[str, int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return str(path), st.st_mtime_ns, st.st_size
+
+
+def _remember(key: tuple[str, int, int] | None, items: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    global _tasks_cache
+    by_id = {str(it.get("id") or ""): it for it in items if isinstance(it, dict)}
+    _tasks_cache = (key, items, by_id) if key is not None else None
+    return by_id
+
+
+def _load_state() -> tuple[list[dict[str, Any]], dict[str, dict[str, Any]]]:
+    """
+    读取任务列表及 id 索引（调用方需持有 _lock）。文件未变化时直接复用上次解析结果，
+    避免任务列表/调度/运行等高频路径每次都重新读取并解析 JSON。
+    """
+    path = tasks_path()
+    key = _file_key(path)
+    if key is None:
+        return [], {}
+    cached = _tasks_cache
+    if cached is not None and cached[0] == key:
+        return cached[1], cached[2]
+    items = _load_json(path)
+    return items, _remember(key, items)
+
+
+def _load_tasks() -> list[dict[str, Any]]:
+    return _load_state()[0]
+
+
+def _save_tasks(items: list[dict[str, Any]]) -> None:
+    path = tasks_path()
+    _dump_json(path, items)
+    _remember(_file_key(path), items)
+
+
 def list_tasks() -> list[dict[str, Any]]:
+    # 返回浅拷贝，调用方增删列表或改写任务字段不会污染缓存
+    with _lock:
+        return [dict(it) for it in _load_tasks()]
+
+
+def get_task(task_id: str) -> dict[str, Any] | None:
+    if not task_id:
+        return None
     with _lock:
-        return _load_json(tasks_path())
+        item = _load_state()[1].get(task_id)
+        return dict(item) if item is not None else None
 
 
 def upsert_task(task: dict[str, Any]) -> dict[str, Any]:
     with _lock:
-        items = _load_json(tasks_path())
+        items = list(_load_tasks())
         if "id" not in task or not task["id"]:
             task["id"] = uuid.uuid4().hex
-            items.append(task)
+            items.append(dict(task))
         else:
             found = False
             for idx, it in enumerate(items):
                 if it.get("id") == task["id"]:
-                    items[idx] = task
+                    items[idx] = dict(task)
                     found = True
                     break
             if not found:
-                items.append(task)
-        _dump_json(tasks_path(), items)
+                items.append(dict(task))
+        _save_tasks(items)
         return task
 
 
 def delete_task(task_id: str) -> bool:
     with _lock:
-        items = _load_json(tasks_path())
+        items = _load_tasks()
         new_items = [it for it in items if it.get("id") != task_id]
         changed = len(new_items) != len(items)
         if changed:
-            _dump_json(tasks_path(), new_items)
+            _save_tasks(new_items)
         return changed
 
 
@@ -1,25 +1,45 @@
 from __future__ import annotations
 
 import os
+import re
 import subprocess
 import threading
 import time
 import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
 
 from . import adb
 from . import autoglm_process
 from . import schedule
-from .config import config_sh_path, read_config
-from .storage import find_by_id, list_tasks
+from .config import config_sh_path, read_config_cached
+from .storage import get_task
+
+
+# (整秒时间戳, 格式化结果)：同一秒内的多行日志复用同一个时间字符串
+_ts_cache: tuple[int, str] = (0, "")
+
+
+def _timestamp() -> str:
+    global _ts_cache
+    now = int(time.time())
+    cached = _ts_cache
+    if cached[0] == now:
+        return cached[1]
+    text = time.strftime("%F %T", time.localtime(now))
+    _ts_cache = (now, text)
+    return text
 
 
 def _log_line(text: str) -> None:
-    lf = autoglm_process.log_file()
-    lf.parent.mkdir(parents=True, exist_ok=True)
-    with lf.open("a", encoding="utf-8") as f:
-        f.write(f"[{time.strftime('%F %T')}] {text}\n")
+    autoglm_process.append_log(f"[{_timestamp()}] {text}")
+
+
+def _log_lines(texts: list[str]) -> None:
+    ts = _timestamp()
+    autoglm_process.append_log_lines([f"[{ts}] {text}" for text in texts])
 
 
 def _autoglm_dir() -> Path:
@@ -29,7 +49,7 @@ def _autoglm_dir() -> Path:
 def ensure_autoglm_running() -> None:
     st = autoglm_process.status()
     if not st.running:
-        cfg = read_config()
+        cfg = read_config_cached()
         key = str(cfg.api_key or "").strip()
         if not key or key in {"sk-your-apikey", "EMPTY"}:
             raise RuntimeError(f"API Key 未配置：请在 {config_sh_path()} 填写有效密钥或通过 Web 界面保存配置")
@@ -49,36 +69,36 @@ def _collect_autoglm_output(
     """
     deadline = time.time() + max(1, int(timeout_s or 20))
     collected: list[str] = []
-    saw_any = False
-
-    while time.time() < deadline:
-        new_offset, chunk = autoglm_process.tail_log(offset)
-        offset = new_offset
-        if chunk:
-            lines = [ln for ln in chunk.splitlines() if ln.strip()]
-            if lines:
-                collected.extend(lines)
-                saw_any = True
-                if stop_on_prompt and any("Enter your task:" in ln for ln in lines):
+    # 尚未以换行结尾的半行：新内容一写入就会被唤醒读取，需等该行写完再拆分，避免一行被拆成两条
+    partial = ""
+
+    with autoglm_process.LogWaiter() as waiter:
+        while True:
+            new_offset, chunk = autoglm_process.tail_log(offset)
+            offset = new_offset
+            if chunk:
+                text = partial + chunk
+                cut = text.rfind("\n") + 1
+                partial = text[cut:]
+                collected.extend(ln for ln in text[:cut].splitlines() if ln.strip())
+                # 整段查找一次即可，不必逐行检查；"Enter your task:" 是 input() 提示，后面没有换行，可能在半行中
+                if stop_on_prompt and "Enter your task:" in text:
                     break
-        # 没有新输出：短暂等待
-        if not saw_any:
-            time.sleep(0.25)
-        else:
-            time.sleep(0.15)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            waiter.wait(remaining)
+    if partial.strip():
+        collected.append(partial)
     return offset, collected
 
 
+# 致命输出：某行（去掉行首空白后）以 "Error:" 开头，或出现 Python 异常栈
+_FATAL_RE = re.compile(r"^\s*Error:|Traceback \(most recent call last\)", re.M)
+
+
 def _is_fatal_autoglm_output(lines: list[str]) -> bool:
-    for ln in lines:
-        s = (ln or "").strip()
-        if not s:
-            continue
-        if s.startswith("Error:"):
-            return True
-        if "Traceback (most recent call last)" in s:
-            return True
-    return False
+    return _FATAL_RE.search("\n".join(lines)) is not None
 
 
 def run_prompt_via_process(prompt: str, *, timeout_s: int = 120) -> tuple[bool, str]:
@@ -89,24 +109,18 @@ def run_prompt_via_process(prompt: str, *, timeout_s: int = 120) -> tuple[bool,
     ensure_autoglm_running()
 
     # 从当前日志末尾开始收集，避免夹杂历史输出
-    try:
-        offset = autoglm_process.log_file().stat().st_size
-    except Exception:
-        offset = 0
+    offset = autoglm_process.log_end_offset()
 
     ok, msg = autoglm_process.send_input(prompt)
     if not ok:
         # 进程句柄不可用时尝试自愈一次
-        if "进程句柄不可用" in (msg or ""):
+        if msg == autoglm_process.HANDLE_GONE_MSG:
             try:
                 autoglm_process.stop()
             except Exception:
                 pass
             ensure_autoglm_running()
-            try:
-                offset = autoglm_process.log_file().stat().st_size
-            except Exception:
-                offset = 0
+            offset = autoglm_process.log_end_offset()
             ok, msg = autoglm_process.send_input(prompt)
         if not ok:
             return False, msg or "发送失败"
@@ -119,12 +133,21 @@ def run_prompt_via_process(prompt: str, *, timeout_s: int = 120) -> tuple[bool,
 
 
 def _format(value: Any, params: dict[str, Any]) -> Any:
-    if isinstance(value, str):
-        try:
-            return value.format(**params)
-        except Exception:
-            return value
-    return value
+    # 大多数字段不含占位符：没有花括号时 format 的结果必然是原串，直接返回
+    if not isinstance(value, str) or ("{" not in value and "}" not in value):
+        return value
+    try:
+        return value.format_map(params)
+    except Exception:
+        return value
+
+
+def _step_int(step: dict[str, Any], key: str, default: int, params: dict[str, Any]) -> int:
+    """读取步骤中的整数字段：已是 int（JSON 中的数字）时不经过 _format；取值为空/0 时使用默认值。"""
+    value = step.get(key, default)
+    if type(value) is int:
+        return value or default
+    return int(_format(value, params) or default)
 
 
 def _step_device_id(step: dict[str, Any], params: dict[str, Any], default_device_id: str | None) -> str | None:
@@ -139,81 +162,183 @@ def _step_device_id(step: dict[str, Any], params: dict[str, Any], default_device
     return device_id or default_device_id
 
 
+def _step_note(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    msg = _format(step.get("text", ""), params)
+    _log_line(f"[note] {msg}")
+    return True, msg
+
+
+def _step_sleep(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    ms = _step_int(step, "ms", 500, params)
+    adb.pause_ms(ms)
+    return True, f"sleep {ms}ms"
+
+
+def _step_adb_shell(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    cmd = _format(step.get("command", ""), params)
+    ok, out = adb.shell(cmd, device_id=device_id)
+    _log_line(f"[adb shell] {cmd} -> {out}")
+    return ok, out
+
+
+def _step_adb_input(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    text = _format(step.get("text", ""), params)
+    ok, out = adb.input_text(text, device_id=device_id)
+    _log_line(f"[adb input] {text} -> {out}")
+    return ok, out
+
+
+def _step_adb_tap(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    x = _step_int(step, "x", 0, params)
+    y = _step_int(step, "y", 0, params)
+    ok, out = adb.tap(x, y, device_id=device_id)
+    _log_line(f"[adb tap] ({x},{y}) -> {out}")
+    return ok, out
+
+
+def _step_adb_swipe(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    x1 = _step_int(step, "x1", 0, params)
+    y1 = _step_int(step, "y1", 0, params)
+    x2 = _step_int(step, "x2", 0, params)
+    y2 = _step_int(step, "y2", 0, params)
+    duration_ms = _step_int(step, "duration_ms", 300, params)
+    ok, out = adb.swipe(x1, y1, x2, y2, duration_ms, device_id=device_id)
+    _log_line(f"[adb swipe] ({x1},{y1})->({x2},{y2}) {duration_ms}ms -> {out}")
+    return ok, out
+
+
+def _step_adb_keyevent(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    key = _format(step.get("key", ""), params)
+    ok, out = adb.keyevent(key, device_id=device_id)
+    _log_line(f"[adb keyevent] {key} -> {out}")
+    return ok, out
+
+
+def _step_app_launch(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    package = _format(step.get("package", ""), params)
+    activity = _format(step.get("activity", ""), params) or None
+    action = _format(step.get("action", "auto"), params)
+    ok, out = adb.start_app(package, activity, action=action, device_id=device_id)
+    _log_line(f"[app launch] {package} {activity or ''} -> {out}")
+    return ok, out
+
+
+def _step_autoglm_prompt(step: dict[str, Any], params: dict[str, Any], device_id: str | None) -> tuple[bool, str]:
+    text = _format(step.get("text", ""), params)
+    timeout_s = _step_int(step, "timeout_s", 120, params)
+    ok, output = run_prompt_via_process(text, timeout_s=timeout_s)
+    out_lines = [f"[autoglm prompt output] {ln}" for ln in (output or "").splitlines()]
+    _log_lines([f"[autoglm prompt] {text}"] + out_lines)
+    return ok, output
+
+
+# 步骤类型 -> 处理函数 (step, params, device_id) -> (ok, output)
+_STEP_HANDLERS: dict[str, Callable[[dict[str, Any], dict[str, Any], str | None], tuple[bool, str]]] = {
+    "note": _step_note,
+    "sleep": _step_sleep,
+    "adb_shell": _step_adb_shell,
+    "adb_input": _step_adb_input,
+    "adb_tap": _step_adb_tap,
+    "adb_swipe": _step_adb_swipe,
+    "adb_keyevent": _step_adb_keyevent,
+    "app_launch": _step_app_launch,
+    "autoglm_prompt": _step_autoglm_prompt,
+}
+
+
 def run_step(step: dict[str, Any], params: dict[str, Any], *, default_device_id: str | None = None) -> tuple[bool, str]:
     stype = step.get("type", "")
-    device_id = _step_device_id(step, params, default_device_id)
-    if stype == "note":
-        msg = _format(step.get("text", ""), params)
-        _log_line(f"[note] {msg}")
-        return True, msg
-    if stype == "sleep":
-        ms = int(_format(step.get("ms", 500), params) or 500)
-        adb.pause_ms(ms)
-        return True, f"sleep {ms}ms"
-    if stype == "adb_shell":
-        cmd = _format(step.get("command", ""), params)
-        ok, out = adb.shell(cmd, device_id=device_id)
-        _log_line(f"[adb shell] {cmd} -> {out}")
-        return ok, out
-    if stype == "adb_input":
-        text = _format(step.get("text", ""), params)
-        ok, out = adb.input_text(text, device_id=device_id)
-        _log_line(f"[adb input] {text} -> {out}")
-        return ok, out
-    if stype == "adb_tap":
-        x = int(_format(step.get("x", 0), params) or 0)
-        y = int(_format(step.get("y", 0), params) or 0)
-        ok, out = adb.tap(x, y, device_id=device_id)
-        _log_line(f"[adb tap] ({x},{y}) -> {out}")
-        return ok, out
-    if stype == "adb_swipe":
-        x1 = int(_format(step.get("x1", 0), params) or 0)
-        y1 = int(_format(step.get("y1", 0), params) or 0)
-        x2 = int(_format(step.get("x2", 0), params) or 0)
-        y2 = int(_format(step.get("y2", 0), params) or 0)
-        duration_ms = int(_format(step.get("duration_ms", 300), params) or 300)
-        ok, out = adb.swipe(x1, y1, x2, y2, duration_ms, device_id=device_id)
-        _log_line(f"[adb swipe] ({x1},{y1})->({x2},{y2}) {duration_ms}ms -> {out}")
-        return ok, out
-    if stype == "adb_keyevent":
-        key = _format(step.get("key", ""), params)
-        ok, out = adb.keyevent(key, device_id=device_id)
-        _log_line(f"[adb keyevent] {key} -> {out}")
-        return ok, out
-    if stype == "app_launch":
-        package = _format(step.get("package", ""), params)
-        activity = _format(step.get("activity", ""), params) or None
-        action = _format(step.get("action", "auto"), params)
-        ok, out = adb.start_app(package, activity, action=action, device_id=device_id)
-        _log_line(f"[app launch] {package} {activity or ''} -> {out}")
-        return ok, out
-    if stype == "autoglm_prompt":
-        text = _format(step.get("text", ""), params)
-        timeout_s = int(_format(step.get("timeout_s", 120), params) or 120)
-        ok, output = run_prompt_via_process(text, timeout_s=timeout_s)
-        _log_line(f"[autoglm prompt] {text}")
-        for ln in (output or "").splitlines():
-            _log_line(f"[autoglm prompt output] {ln}")
-        return ok, output
-    return False, f"未知步骤类型: {stype}"
+    handler = _STEP_HANDLERS.get(stype) if isinstance(stype, str) else None
+    if handler is None:
+        return False, f"未知步骤类型: {stype}"
+    return handler(step, params, _step_device_id(step, params, default_device_id))
 
 
-def run_task_by_id(task_id: str, params: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+# 并行任务中同一组步骤的最大并发数
+_MAX_GROUP_WORKERS = 8
+# 不参与并行分组的步骤：autoglm_prompt 共用同一个 AutoGLM 进程的 stdin 与日志，app 会直接中止任务
+_SERIAL_STEP_TYPES = frozenset({"autoglm_prompt", "app"})
+# 不访问设备的步骤：并行组内不与任何设备的步骤排在同一道
+_DEVICE_FREE_STEP_TYPES = frozenset({"note", "sleep"})
+
+
+def _step_batches(steps: list[dict[str, Any]], parallel: bool) -> Iterator[list[dict[str, Any]]]:
+    """
+    把步骤切分为依次执行的批次。parallel 任务中相邻且 group 相同的步骤合为一批并发执行，
+    其余步骤（及非 parallel 任务的全部步骤）每步单独一批，保持原有顺序语义。
+    """
+    batch: list[dict[str, Any]] = []
+    batch_group: str | None = None
+    for st in steps:
+        group = st.get("group") if parallel else None
+        key = str(group) if group not in (None, "") and st.get("type") not in _SERIAL_STEP_TYPES else None
+        if batch and (key is None or key != batch_group):
+            yield batch
+            batch = []
+        batch.append(st)
+        batch_group = key
+    if batch:
+        yield batch
+
+
+def _run_step_group(
+    steps: list[dict[str, Any]], params: dict[str, Any], default_device_id: str | None
+) -> list[dict[str, Any]]:
+    """
+    按设备分道并发执行同一组步骤：同一设备的步骤本就共用该设备的 adb shell 会话（同一把锁），
+    因此放在同一线程内按顺序执行，不同设备之间并发；note/sleep 不访问设备，各自单独一道。结果按步骤顺序返回；
+    有步骤失败时各分道不再开始新的步骤（未执行的步骤不返回结果）。
+    """
+    lanes: dict[tuple[str, str | int | None], list[int]] = {}
+    for i, st in enumerate(steps):
+        if st.get("type") in _DEVICE_FREE_STEP_TYPES:
+            lanes[("step", i)] = [i]
+        else:
+            lanes.setdefault(("device", _step_device_id(st, params, default_device_id)), []).append(i)
+    outcomes: list[tuple[bool, str] | None] = [None] * len(steps)
+    failed = threading.Event()
+
+    def _run_lane(indexes: list[int]) -> None:
+        for i in indexes:
+            if failed.is_set():
+                return
+            try:
+                ok, out = run_step(steps[i], params, default_device_id=default_device_id)
+            except BaseException:
+                failed.set()
+                raise
+            outcomes[i] = (ok, out)
+            if not ok:
+                failed.set()
+                return
+
+    workers = min(_MAX_GROUP_WORKERS, len(lanes))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="autoglm-step") as pool:
+        futures = [pool.submit(_run_lane, indexes) for indexes in lanes.values()]
+    for fut in futures:
+        fut.result()
+    return [
+        {"type": st.get("type"), "ok": res[0], "output": res[1]}
+        for st, res in zip(steps, outcomes)
+        if res is not None
+    ]
+
+
+def iter_task_results(task_id: str, params: dict[str, Any] | None = None) -> Iterator[dict[str, Any]]:
+    """
+    逐步执行任务，每完成一步产出一条结果 {"type", "ok", "output"}，失败即停止。
+    找不到任务抛 ValueError、前置条件不满足抛 RuntimeError（均在取第一条结果时抛出）。
+    """
     params = params or {}
-    tasks = list_tasks()
-    task = find_by_id(tasks, task_id)
+    task = get_task(task_id)
     if not task:
         raise ValueError("未找到任务")
-    results: list[dict[str, Any]] = []
-    cfg = read_config()
+    cfg = read_config_cached()
     default_device_id = cfg.device_id or None
     if not default_device_id:
         try:
-            ds = adb.devices(raise_on_error=False)
-            for d in ds:
-                if d.status == "device":
-                    default_device_id = d.serial
-                    break
+            online = adb.online_serials()
+            default_device_id = online[0] if online else None
         except Exception:
             default_device_id = None
     prompt = task.get("prompt", "")
@@ -225,32 +350,53 @@ def run_task_by_id(task_id: str, params: dict[str, Any] | None = None) -> list[d
         except Exception:
             timeout_s = 600
         ok, out = run_prompt_via_process(str(prompt or ""), timeout_s=timeout_s)
-        results.append({"type": "autoglm_prompt", "ok": ok, "output": out})
-        return results
+        yield {"type": "autoglm_prompt", "ok": ok, "output": out}
+        return
 
     needs_autoglm = any(str(st.get("type", "") or "") == "autoglm_prompt" for st in (steps or []))
     if needs_autoglm:
         ensure_autoglm_running()
-    for st in steps:
+    for batch in _step_batches(steps, bool(task.get("parallel"))):
+        if len(batch) > 1:
+            results = _run_step_group(batch, params, default_device_id)
+            yield from results
+            if not all(r["ok"] for r in results):
+                break
+            continue
+        st = batch[0]
         if st.get("type") == "app":
             app_id = st.get("app_id", "")
             msg = f"应用库功能已移除，无法执行应用 {app_id or '未指定'}，请直接在任务步骤中编排 adb_* 或 autoglm_prompt"
-            results.append({"type": "app", "app_id": app_id, "ok": False, "output": msg})
+            yield {"type": "app", "app_id": app_id, "ok": False, "output": msg}
             break
         ok, out = run_step(st, params, default_device_id=default_device_id)
-        results.append({"type": st.get("type"), "ok": ok, "output": out})
+        yield {"type": st.get("type"), "ok": ok, "output": out}
         if not ok:
             break
-    return results
 
 
-# 调度器接入：避免循环引用，定义后再配置 runner
-schedule.configure_runner(run_task_by_id)
-schedule.ensure_scheduler_started()
+def run_task_by_id(task_id: str, params: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+    return list(iter_task_results(task_id, params))
+
+
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler() -> None:
+    """
+    接入 runner 并启动调度线程（可重复调用）。导入本模块时不再自动启动，
+    只用到辅助函数的调用方不会因此拉起后台线程；Web 服务在启动时调用。
+    """
+    with _scheduler_lock:
+        schedule.configure_runner(run_task_by_id)
+        schedule.ensure_scheduler_started()
 
 
-MAX_SESSIONS = 50  # 会话上限，超出则丢弃最早的
-_sessions: dict[str, list[str]] = {}
+MAX_SESSIONS = 50  # 会话上限，超出则丢弃最久未使用的
+# 按最近使用排序：发送/查看会话时移到末尾，淘汰时从头部取出，正在使用的会话不会被挤掉
+_sessions: OrderedDict[str, deque[str]] = OrderedDict()
+# 每个会话只保留最近的记录（接口最多返回 50 行），长时间使用的会话内存占用不再持续增长
+SESSION_LOG_MAX = 200
 _session_offsets: dict[str, int] = {}
 _sessions_lock = threading.Lock()
 
@@ -259,16 +405,11 @@ def new_session() -> str:
     sid = uuid.uuid4().hex
     with _sessions_lock:
         # 控制会话总数
-        if len(_sessions) >= MAX_SESSIONS:
-            # FIFO 删除最早创建的会话
-            oldest_sid = next(iter(_sessions))
-            del _sessions[oldest_sid]
+        while len(_sessions) >= MAX_SESSIONS:
+            oldest_sid, _ = _sessions.popitem(last=False)
             _session_offsets.pop(oldest_sid, None)
-        _sessions[sid] = []
-        try:
-            _session_offsets[sid] = autoglm_process.log_file().stat().st_size
-        except Exception:
-            _session_offsets[sid] = 0
+        _sessions[sid] = deque(maxlen=SESSION_LOG_MAX)
+        _session_offsets[sid] = autoglm_process.log_end_offset()
     _log_line(f"[session {sid}] started")
     return sid
 
@@ -277,6 +418,7 @@ def send_interactive(sid: str, text: str) -> list[str]:
     with _sessions_lock:
         if sid not in _sessions:
             raise ValueError("会话不存在")
+        _sessions.move_to_end(sid)
         offset = _session_offsets.get(sid, 0)
     st = autoglm_process.status()
     if not st.running:
@@ -288,55 +430,64 @@ def send_interactive(sid: str, text: str) -> list[str]:
     else:
         collected: list[str] = []
         try:
-            # 轮询几次，尽量获取完整日志片段
-            for _ in range(12):
-                new_offset, chunk = autoglm_process.tail_log(offset)
-                offset = new_offset
-                if chunk:
-                    collected.extend(chunk.splitlines())
-                    # 若已有输出，跳出；否则继续等
-                    if chunk.strip():
+            # 最多等待约 3 秒，日志一有新输出就读取返回
+            deadline = time.time() + 3.0
+            with autoglm_process.LogWaiter() as waiter:
+                while True:
+                    new_offset, chunk = autoglm_process.tail_log(offset)
+                    offset = new_offset
+                    if chunk:
+                        collected.extend(chunk.splitlines())
+                        # 若已有输出，跳出；否则继续等
+                        if chunk.strip():
+                            break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
                         break
-                time.sleep(0.25)
+                    waiter.wait(remaining)
             output_lines = [ln for ln in collected if ln.strip()]
             if not output_lines:
                 output_lines = ["已发送，暂无新日志（可能仍在执行）"]
         except Exception as e:
             output_lines = [f"发送成功，但读取日志失败: {e}"]
     line = f"[session {sid}] {text}"
+    # 要追加的记录先在锁外拼好，持锁期间只做一次 extend 并取出返回值
+    entries = [line] + [f"[session {sid}] {ln}" for ln in output_lines]
     with _sessions_lock:
         if sid not in _sessions:
             raise ValueError("会话不存在")
         _session_offsets[sid] = offset
-        _sessions[sid].append(line)
-        for ln in output_lines:
-            _sessions[sid].append(f"[session {sid}] {ln}")
-    _log_line(line)
-    for ln in output_lines:
-        _log_line(f"[session {sid} output] {ln}")
-    with _sessions_lock:
-        if sid not in _sessions:
-            return []
-        return _sessions[sid][-20:]
+        history = _sessions[sid]
+        history.extend(entries)
+        recent = list(history)[-20:]
+    _log_lines([line] + [f"[session {sid} output] {ln}" for ln in output_lines])
+    return recent
 
 
 def get_interactive_log(sid: str) -> list[str]:
     with _sessions_lock:
         if sid not in _sessions:
             return []
-        return _sessions[sid][-50:]
+        _sessions.move_to_end(sid)
+        return list(_sessions[sid])[-50:]
+
+
+# run_prompt_once 返回值中 stdout / stderr 各自最多保留的行数（更早的 stdout 行只写入日志）
+_PROMPT_ONCE_TAIL_LINES = 1000
+# stdout 转写到日志时按批写入：攒够行数或距上次写入超过间隔才落盘一次，避免逐行写文件
+_PROMPT_ONCE_LOG_BATCH = 50
+_PROMPT_ONCE_LOG_INTERVAL_S = 0.5
 
 
 def run_prompt_once(prompt: str, timeout_s: int = 600) -> str:
-    cfg = read_config()
+    cfg = read_config_cached()
     if not cfg.api_key or str(cfg.api_key).strip() in {"sk-your-apikey", "EMPTY"}:
         raise RuntimeError(f"API Key 未配置：请在 {config_sh_path()} 填写有效密钥或通过 Web 界面保存配置")
 
     resolved_device_id = str(cfg.device_id or "").strip()
     if not resolved_device_id:
         try:
-            ds = adb.devices(raise_on_error=False)
-            online = [d.serial for d in ds if d.status == "device"]
+            online = adb.online_serials()
             if len(online) == 1:
                 resolved_device_id = online[0]
             elif len(online) > 1:
@@ -370,21 +521,81 @@ def run_prompt_once(prompt: str, timeout_s: int = 600) -> str:
 
     input_data = f"{prompt}\nquit\n"
     try:
-        proc = subprocess.run(
+        proc = subprocess.Popen(
             args,
             cwd=str(workdir),
-            input=input_data,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=True,
-            capture_output=True,
-            timeout=timeout_s,
         )
-    except subprocess.TimeoutExpired:
+    except OSError as e:
+        raise RuntimeError(f"启动 AutoGLM 子进程失败: {e}")
+    _log_line(f"[prompt once] {prompt}")
+
+    # stdout 边读边按批转写到日志（Web 日志可看到进度）；stderr 单独管道，由后台线程收集，
+    # 与原先一样拼接在 stdout 之后返回。两者在内存中都只保留最后若干行。
+    out_tail: deque[str] = deque(maxlen=_PROMPT_ONCE_TAIL_LINES)
+    err_tail: deque[str] = deque(maxlen=_PROMPT_ONCE_TAIL_LINES)
+    out_total = 0
+    err_total = 0
+    timed_out = threading.Event()
+
+    def _kill() -> None:
+        timed_out.set()
+        proc.kill()
+
+    def _drain_stderr() -> None:
+        nonlocal err_total
+        assert proc.stderr is not None
+        for raw in proc.stderr:
+            err_tail.append(raw.rstrip("\n"))
+            err_total += 1
+
+    err_reader = threading.Thread(target=_drain_stderr, daemon=True)
+    err_reader.start()
+    timer = threading.Timer(timeout_s, _kill)
+    timer.daemon = True
+    timer.start()
+    batch: list[str] = []
+    last_flush = time.monotonic()
+    try:
+        assert proc.stdin is not None and proc.stdout is not None
+        try:
+            proc.stdin.write(input_data)
+            proc.stdin.close()
+        except OSError:
+            # 子进程已提前退出：照常读取其输出
+            pass
+        for raw in proc.stdout:
+            line = raw.rstrip("\n")
+            out_tail.append(line)
+            out_total += 1
+            batch.append(f"[prompt once output] {line}")
+            if len(batch) >= _PROMPT_ONCE_LOG_BATCH or time.monotonic() - last_flush >= _PROMPT_ONCE_LOG_INTERVAL_S:
+                _log_lines(batch)
+                batch = []
+                last_flush = time.monotonic()
+        proc.wait()
+        err_reader.join()
+    finally:
+        timer.cancel()
+        if batch:
+            _log_lines(batch)
+    if timed_out.is_set():
         raise RuntimeError("执行超时")
-    output = (proc.stdout or "") + ("\n" + proc.stderr if proc.stderr else "")
+    output = "\n".join(out_tail)
+    if out_total > len(out_tail):
+        output = f"...(前 {out_total - len(out_tail)} 行已省略，完整输出见日志)\n{output}"
+    if err_tail:
+        err_text = "\n".join(err_tail)
+        if err_total > len(err_tail):
+            err_text = f"...(stderr 前 {err_total - len(err_tail)} 行已省略)\n{err_text}"
+        output += "\n" + err_text
+    output = output.strip()
     if proc.returncode != 0:
-        brief_out = output.strip()
+        brief_out = output
         if len(brief_out) > 800:
             brief_out = brief_out[:800] + "...(truncated)"
         raise RuntimeError(f"AutoGLM 子进程退出码 {proc.returncode}，输出: {brief_out or '无'}")
-    _log_line(f"[prompt once] {prompt}")
-    return output.strip()
+    return output
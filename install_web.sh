@@ -79,9 +79,13 @@ main() {
     fi
   fi
 
-  log "安装 Python 依赖: fastapi uvicorn"
+  log "安装 Python 依赖: fastapi uvicorn websockets"
   python -m pip install --upgrade pip >/dev/null 2>&1 || true
-  python -m pip install --upgrade fastapi uvicorn
+  python -m pip install --upgrade fastapi uvicorn websockets
+  # 可选加速：uvloop 事件循环 + httptools 解析器（Termux 上需编译，失败不影响使用）
+  python -m pip install --upgrade uvloop httptools >/dev/null 2>&1 || warn "uvloop/httptools 安装失败，将使用默认事件循环与 HTTP 解析器"
+  # 可选加速：orjson 读写调度配置（Termux 上需 Rust 编译，失败时回退到标准库 json）
+  python -m pip install --upgrade orjson >/dev/null 2>&1 || warn "orjson 安装失败，将使用标准库 json"
 
   local install_dir="${AUTOGLM_WEB_INSTALL_DIR:-$HOME/.autoglm/webapp}"
   download_web_sources "$install_dir"